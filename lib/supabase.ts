@@ -152,23 +152,22 @@ export interface BSSnapshotRow {
   balance: number;
 }
 
+// odoo_bs_snapshots stores keyframes plus changed rows only (see
+// supabase-bs-delta-setup.sql), so dates come from the date index and full
+// snapshots are rebuilt server-side.
 export async function fetchBSSnapshotDates(): Promise<string[]> {
   const { data, error } = await supabase
-    .from('odoo_bs_snapshots')
+    .from('odoo_bs_snapshot_dates')
     .select('snapshot_date')
     .order('snapshot_date', { ascending: false });
 
   if (error) throw error;
-  const unique = [...new Set((data || []).map((r: { snapshot_date: string }) => r.snapshot_date))];
-  return unique;
+  return (data || []).map((r: { snapshot_date: string }) => r.snapshot_date);
 }
 
 export async function fetchBSSnapshot(snapshotDate: string): Promise<BSSnapshotRow[]> {
   const { data, error } = await supabase
-    .from('odoo_bs_snapshots')
-    .select('id,snapshot_date,row_order,level,parent_section,code,name,balance')
-    .eq('snapshot_date', snapshotDate)
-    .order('row_order', { ascending: true });
+    .rpc('odoo_bs_snapshot_as_of', { p_date: snapshotDate });
 
   if (error) throw error;
   return (data || []) as BSSnapshotRow[];
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark chunked inserts against a local fake PostgREST server.
+
+Usage:  python scripts/bench_bulk_insert.py
+        python scripts/bench_bulk_insert.py --rows 50000 --latency-ms 40 --workers 1 4 8
+
+The fake server accepts POST /rest/v1/<table>, decodes the JSON body like
+PostgREST would, sleeps a fixed per-request latency plus a small per-row cost,
+rejects bodies above --max-body with 413, and fails a fraction of requests
+with 503 so the per-chunk retry path is exercised. --commit-fail-rate stores
+a chunk and then answers 504, like a gateway timing out on a committed insert.
+The server counts the rows it stored, so a retry that inserts a chunk twice
+shows up as a stored count above the rows sent. Nothing touches Supabase.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from supabase_bulk import bulk_insert
+
+
+def make_handler(latency, per_row, max_body, fail_rate, commit_fail_rate, stored):
+    """`stored` is a one-item list the server adds committed rows to."""
+    lock = threading.Lock()
+
+    class FakePostgREST(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body=b''):
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length)
+            if length > max_body:
+                self._reply(413, b'{"message":"Payload too large"}')
+                return
+            rows = json.loads(raw)
+            time.sleep(latency + per_row * len(rows))
+            if random.random() < fail_rate:
+                self._reply(503, b'{"message":"Service unavailable"}')
+                return
+            with lock:
+                stored[0] += len(rows)
+            if random.random() < commit_fail_rate:
+                self._reply(504, b'{"message":"Gateway timeout"}')
+                return
+            self._reply(201)
+
+    return FakePostgREST
+
+
+def fake_rows(n):
+    """Aged-receivable shaped rows, the widest snapshot we import."""
+    for i in range(n):
+        yield {
+            'snapshot_date': '2026-02-21',
+            'row_order': i + 1,
+            'partner_name': f'Partner {i:06d} Marine Excursions Ltd',
+            'is_total': False,
+            'at_date': round(random.uniform(0, 5000), 2),
+            'bucket_1_30': round(random.uniform(0, 5000), 2),
+            'bucket_31_60': round(random.uniform(0, 5000), 2),
+            'bucket_61_90': 0.0,
+            'bucket_91_120': 0.0,
+            'older': round(random.uniform(0, 500), 2),
+            'total': round(random.uniform(0, 15000), 2),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chunked inserts against a fake PostgREST')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[50, 100, 250, 500, 1000, 2500, 5000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='fixed cost per request')
+    parser.add_argument('--per-row-us', type=float, default=20.0, help='server cost per row')
+    parser.add_argument('--max-body', type=int, default=1_000_000, help='413 above this many bytes')
+    parser.add_argument('--fail-rate', type=float, default=0.02, help='fraction of requests answered with 503')
+    parser.add_argument('--commit-fail-rate', type=float, default=0.0,
+                        help='fraction of requests stored and then answered with 504')
+    args = parser.parse_args()
+
+    random.seed(0)
+    stored = [0]
+    handler = make_handler(args.latency_ms / 1000, args.per_row_us / 1e6,
+                           args.max_body, args.fail_rate, args.commit_fail_rate, stored)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    print(f"Fake PostgREST at {url}: {args.latency_ms:.0f} ms/request, "
+          f"{args.per_row_us:.0f} us/row, max body {args.max_body:,} bytes, "
+          f"{args.fail_rate:.0%} 503s, {args.commit_fail_rate:.0%} 504s after commit")
+    print(f"{args.rows:,} rows per run")
+    print()
+    print(f"{'chunk':>7} {'workers':>7} {'seconds':>8} {'rows/s':>10} {'retries':>7} {'failed':>6} {'stored':>8}")
+
+    for workers in args.workers:
+        for chunk_size in args.chunk_sizes:
+            stored[0] = 0
+            stats = bulk_insert(url, 'bench-key', 'odoo_ar_snapshots', fake_rows(args.rows),
+                                chunk_size=chunk_size, workers=workers, retries=3, backoff=0.05)
+            failed_rows = sum(count for _, count, _, _ in stats['failed'])
+            print(f"{chunk_size:>7} {workers:>7} {stats['seconds']:>8.2f} "
+                  f"{stats['rows_per_sec']:>10,.0f} {stats['retries']:>7} {failed_rows:>6} {stored[0]:>8}")
+            if stored[0] > args.rows:
+                print(f"        WARNING: server stored {stored[0] - args.rows} rows more than were sent")
+        print()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
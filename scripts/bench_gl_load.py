@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark the COPY loader against the batched REST-style insert path.
+
+Usage:  python scripts/bench_gl_load.py --dsn postgresql://postgres:pw@localhost:5432/postgres
+        python scripts/bench_gl_load.py --dsn ... --rows 200000
+        python scripts/bench_gl_load.py --dsn ... --latency-ms 40
+        python scripts/bench_gl_load.py --dsn ... --rest-url http://localhost:3000 --rest-key KEY
+
+Works in a scratch schema (gl_bench) on a local Postgres, never on Supabase.
+The REST path runs supabase_bulk against a stand-in for PostgREST on
+localhost: each POST body is decoded and inserted with
+json_populate_recordset in its own transaction, which is what PostgREST does
+per request. There is no network latency or auth on loopback, so by default
+it is a lower bound on what the same load costs against Supabase;
+--latency-ms adds a fixed delay to every stand-in request to model the round
+trip. COPY streams the whole load over one connection, so it pays that round
+trip a handful of times rather than once per batch, and is not delayed here.
+Pass --rest-url to time a real local PostgREST that exposes
+gl_bench.gwr_general_ledger instead.
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from load_general_ledger_copy import GL_COLUMNS, connect, copy_load
+from supabase_bulk import bulk_insert
+
+BENCH_TABLE = 'gl_bench.gwr_general_ledger'
+REST_BATCH = 500
+
+
+def fake_ledger(n):
+    """Synthetic ledger lines shaped like the Odoo extract."""
+    random.seed(0)
+    start = date(2019, 1, 1)
+    accounts = [(400000 + i, f'Account {i}') for i in range(120)]
+    rows = []
+    for i in range(n):
+        account_id, account_name = random.choice(accounts)
+        amount = round(random.uniform(1, 25000), 2)
+        debit = amount if i % 2 == 0 else 0.0
+        credit = 0.0 if i % 2 == 0 else amount
+        rows.append((
+            i + 1, i // 2 + 1, f'INV/2024/{i // 2 + 1:06d}',
+            (start + timedelta(days=i % 2500)).isoformat(),
+            account_id, account_name,
+            random.randint(1, 900), f'Partner {random.randint(1, 900)}',
+            f'Catamaran cruise booking {i}', f'REF{i}', 'Customer Invoices',
+            debit, credit, round(debit - credit, 2),
+        ))
+    return rows
+
+
+def reset_schema(conn):
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute('DROP SCHEMA IF EXISTS gl_bench CASCADE')
+        cur.execute('CREATE SCHEMA gl_bench')
+        cur.execute("""
+            CREATE TABLE gl_bench.gwr_general_ledger (
+              id            bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+              entry_id      integer NOT NULL,
+              move_id       integer NOT NULL,
+              move_number   text NOT NULL,
+              date          date NOT NULL,
+              account_id    integer NOT NULL,
+              account_name  text NOT NULL,
+              partner_id    integer,
+              partner_name  text,
+              description   text,
+              reference     text,
+              journal       text NOT NULL,
+              debit         numeric(15,2) NOT NULL DEFAULT 0,
+              credit        numeric(15,2) NOT NULL DEFAULT 0,
+              balance       numeric(15,2) NOT NULL DEFAULT 0,
+              created_at    timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute('CREATE UNIQUE INDEX ON gl_bench.gwr_general_ledger(entry_id)')
+        cur.execute('CREATE INDEX ON gl_bench.gwr_general_ledger(date)')
+        cur.execute('CREATE INDEX ON gl_bench.gwr_general_ledger(account_id)')
+        cur.execute('CREATE INDEX ON gl_bench.gwr_general_ledger(journal)')
+
+
+def truncate(conn):
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute(f'TRUNCATE {BENCH_TABLE}')
+
+
+def start_rest_standin(dsn, latency=0.0):
+    """Serve POST /rest/v1/gwr_general_ledger on localhost, one DB connection per thread.
+
+    `latency` seconds are added to every request, standing in for the round trip.
+    """
+    cols = ', '.join(GL_COLUMNS)
+    stmt = (f'INSERT INTO {BENCH_TABLE} ({cols}) '
+            f'SELECT {cols} FROM json_populate_recordset(NULL::{BENCH_TABLE}, %s::json)')
+    local = threading.local()
+
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if not hasattr(local, 'conn'):
+                local.conn = connect(dsn)
+            with local.conn.transaction(), local.conn.cursor() as cur:
+                cur.execute(stmt, (body.decode('utf-8'),))
+            time.sleep(latency)
+            self.send_response(201)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def rest_load(url, key, rows, workers):
+    return bulk_insert(url, key, 'gwr_general_ledger',
+                       (dict(zip(GL_COLUMNS, r)) for r in rows),
+                       chunk_size=REST_BATCH, workers=workers)
+
+
+def report(label, n, seconds, baseline=None):
+    rate = n / seconds if seconds > 0 else 0.0
+    speedup = f'{baseline / seconds:>7.1f}x' if baseline else ''
+    print(f"  {label:<34} {seconds:>8.2f}s {rate:>12,.0f} rows/s {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark COPY vs REST-style GL loading')
+    parser.add_argument('--dsn', required=True, help='local PostgreSQL connection string')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--rest-url', help='real local PostgREST base URL (default: built-in stand-in)')
+    parser.add_argument('--rest-key', default='', help='JWT for the local PostgREST')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='delay added to every stand-in REST request (ignored with --rest-url)')
+    args = parser.parse_args()
+
+    rows = fake_ledger(args.rows)
+    print(f"{len(rows):,} synthetic ledger lines, table {BENCH_TABLE}")
+    if not args.rest_url:
+        print(f"REST stand-in: {args.latency_ms:.0f} ms/request")
+    print()
+
+    with connect(args.dsn) as conn:
+        conn.autocommit = True
+        reset_schema(conn)
+
+        if args.rest_url:
+            url, key, server = args.rest_url, args.rest_key, None
+        else:
+            server, url = start_rest_standin(args.dsn, args.latency_ms / 1000)
+            key = 'bench-key'
+
+        # import-general-ledger.mjs sends one batch at a time
+        truncate(conn)
+        stats = rest_load(url, key, rows, workers=1)
+        rest_seconds = stats['seconds']
+        report(f'REST, {REST_BATCH}-row batches, sequential', stats['rows'], rest_seconds)
+
+        truncate(conn)
+        stats = rest_load(url, key, rows, workers=4)
+        report(f'REST, {REST_BATCH}-row batches, 4 workers', stats['rows'], stats['seconds'], rest_seconds)
+
+        if server:
+            server.shutdown()
+
+        truncate(conn)
+        stats = copy_load(conn, iter(rows), target=BENCH_TABLE)
+        report('COPY + merge, empty table', stats['staged'], stats['seconds'], rest_seconds)
+        print(f"    copy {stats['copy_seconds']:.2f}s, merge {stats['merge_seconds']:.2f}s, "
+              f"prune {stats['prune_seconds']:.2f}s")
+
+        stats = copy_load(conn, iter(rows), target=BENCH_TABLE)
+        report('COPY + merge, unchanged reload', stats['staged'], stats['seconds'], rest_seconds)
+        print(f"    {stats['upserted']} rows rewritten, {stats['pruned']} pruned")
+
+        with conn.cursor() as cur:
+            cur.execute('DROP SCHEMA gl_bench CASCADE')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark Odoo's XML-RPC and JSON-RPC transports against a local stand-in.
+
+Usage:  python scripts/bench_odoo_transport.py
+        python scripts/bench_odoo_transport.py --rows 100000 --latency-ms 30
+
+The stand-in server answers /xmlrpc/2/common, /xmlrpc/2/object and /jsonrpc
+like Odoo does for authenticate, search_count and search_read on a synthetic
+account.move.line table. Each response is encoded once and then replayed, so
+the end-to-end numbers measure transfer plus client-side decoding rather than
+the stand-in's own serializer. Reported per transport:
+
+  - payload bytes of one BATCH_SIZE search_read page
+  - decode time of that page (xmlrpc.client.loads vs json.loads)
+  - end-to-end rows/s of fetch_entries + flatten_entries through OdooClient
+
+The flattened rows of both transports are compared and must be identical.
+Nothing touches the real Odoo.
+"""
+import io
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+import xmlrpc.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from extract_general_ledger import BATCH_SIZE, DOMAIN, FIELDS, fetch_entries, flatten_entries
+from odoo_client import OdooClient, PROTOCOLS
+
+ACCOUNTS = [
+    [101, '400000 Sales - Water Sports'], [102, '400100 Sales - Boat Tours'],
+    [110, '121000 Account Receivable'], [120, '211000 Account Payable'],
+    [130, '101401 Bank MCB'], [140, '620000 Fuel Expenses'],
+]
+JOURNALS = [[1, 'Customer Invoices'], [2, 'Vendor Bills'], [3, 'Bank'], [4, 'Miscellaneous Operations']]
+
+
+def fake_move_lines(n, seed=0):
+    """account.move.line records as search_read returns them (many2one = [id, name])."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        day = f'2025-{(i * 12 // n) + 1:02d}-{(i % 28) + 1:02d}'
+        amount = round(rng.uniform(1, 25000), 2)
+        debit = amount if i % 2 == 0 else 0.0
+        credit = 0.0 if i % 2 == 0 else amount
+        partner = [2000 + i % 350, f'Customer {i % 350:04d} Holidays Ltd'] if i % 3 else False
+        lines.append({
+            'id': i + 1,
+            'move_id': [i // 2 + 1, f'INV/2025/{i // 2 + 1:05d}'],
+            'date': day,
+            'account_id': rng.choice(ACCOUNTS),
+            'partner_id': partner,
+            'name': f'Catamaran cruise x{i % 9 + 1}' if i % 4 else False,
+            'ref': f'SO{i // 2:05d}' if i % 5 else False,
+            'debit': debit,
+            'credit': credit,
+            'balance': round(debit - credit, 2),
+            'journal_id': rng.choice(JOURNALS),
+            'company_id': [1, 'Gutty Waverunner Ltd'],
+        })
+    return lines
+
+
+def dispatch(lines, service, method, args):
+    """What Odoo would return for the handful of calls the extractor makes."""
+    if service == 'common' and method == 'authenticate':
+        return 2
+    if service == 'object' and method == 'execute_kw':
+        _db, _uid, _password, _model, model_method, _args, kwargs = args
+        if model_method == 'search_count':
+            return len(lines)
+        if model_method == 'search_read':
+            offset = kwargs.get('offset', 0)
+            page = lines[offset:offset + kwargs.get('limit', len(lines))]
+            fields = ['id'] + kwargs['fields']
+            return [{f: line[f] for f in fields} for line in page]
+    raise ValueError(f'unsupported call {service}.{method}')
+
+
+def make_handler(lines, latency):
+    replies = {}
+    replies_lock = threading.Lock()
+
+    class FakeOdoo(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path == '/jsonrpc':
+                request = json.loads(raw)
+                params = request['params']
+                key = (self.path, json.dumps(params['args']), params['method'])
+                call = (params['service'], params['method'], params['args'])
+            else:
+                args, method = xmlrpc.client.loads(raw)
+                key = (self.path, raw)
+                call = (self.path.rsplit('/', 1)[-1], method, args)
+
+            with replies_lock:
+                encoded = replies.get(key)
+            if encoded is None:
+                result = dispatch(lines, *call)
+                if self.path == '/jsonrpc':
+                    encoded = json.dumps(result).encode()
+                else:
+                    encoded = xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True).encode()
+                with replies_lock:
+                    replies[key] = encoded
+
+            if self.path == '/jsonrpc':
+                body = b'{"jsonrpc": "2.0", "id": %d, "result": %s}' % (request['id'], encoded)
+                content_type = 'application/json'
+            else:
+                body, content_type = encoded, 'text/xml'
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeOdoo
+
+
+def page_payloads(lines):
+    page = dispatch(lines, 'object', 'execute_kw',
+                    ('db', 2, 'pw', 'account.move.line', 'search_read', [DOMAIN],
+                     {'fields': FIELDS, 'limit': BATCH_SIZE, 'offset': 0}))
+    return {
+        'xmlrpc': xmlrpc.client.dumps((page,), methodresponse=True, allow_none=True).encode(),
+        'jsonrpc': json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': page}).encode(),
+    }
+
+
+def time_decode(protocol, payload, repeat):
+    decode = (lambda: xmlrpc.client.loads(payload)) if protocol == 'xmlrpc' else (lambda: json.loads(payload))
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def time_end_to_end(url, protocol, repeat):
+    best, rows = float('inf'), None
+    for _ in range(repeat):
+        client = OdooClient(url, 'bench', 'bench@example.com', 'bench', uid_cache=None, protocol=protocol)
+        with client, contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            rows = flatten_entries(fetch_entries(client, DOMAIN))
+            best = min(best, time.perf_counter() - started)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Odoo XML-RPC vs JSON-RPC against a local stand-in')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='fixed server cost per request')
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs')
+    args = parser.parse_args()
+
+    lines = fake_move_lines(args.rows)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(lines, args.latency_ms / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    print(f"Stand-in Odoo at {url}: {args.rows:,} move lines, "
+          f"{BATCH_SIZE:,} per page, {args.latency_ms:.0f} ms/request")
+    print()
+
+    payloads = page_payloads(lines)
+    print(f"One {BATCH_SIZE:,}-row search_read page:")
+    print(f"{'transport':>10} {'bytes':>12} {'decode ms':>10} {'MB/s':>8}")
+    for protocol in PROTOCOLS:
+        seconds = time_decode(protocol, payloads[protocol], args.repeat * 3)
+        print(f"{protocol:>10} {len(payloads[protocol]):>12,} {seconds * 1000:>10.1f} "
+              f"{len(payloads[protocol]) / seconds / 1e6:>8.1f}")
+    print()
+
+    print("End to end (search_count + paged search_read + flatten_entries):")
+    print(f"{'transport':>10} {'seconds':>8} {'rows/s':>10}")
+    results = {}
+    for protocol in PROTOCOLS:
+        # Warm the server's reply cache so both transports replay pre-encoded pages
+        time_end_to_end(url, protocol, 1)
+        seconds, results[protocol] = time_end_to_end(url, protocol, args.repeat)
+        print(f"{protocol:>10} {seconds:>8.2f} {args.rows / seconds:>10,.0f}")
+    print()
+
+    identical = results['xmlrpc'] == results['jsonrpc']
+    print(f"Flattened output identical across transports: {'yes' if identical else 'NO'}")
+    server.shutdown()
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
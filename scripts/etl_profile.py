@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Per-stage profiling for the extractor and the importers (--profile).
+
+Wrap each stage of a run in `profiler.stage(name)`. With profiling on, every
+stage gets its own cProfile stats, a tracemalloc comparison of what the stage
+allocated, and wall-clock stack samples from all threads. Upload JSON is
+encoded in bulk_insert's worker threads, so those are profiled too. Backfill
+parses workbooks in worker processes; their cProfile stats are merged into the
+parse stage's .pstats (add_process_stats), but that stage's samples and memory
+figures cover the waiting parent only. Files are written next to the output,
+sharing one prefix:
+
+  <prefix>.<stage>.pstats   cProfile stats (python -m pstats, snakeviz)
+  <prefix>.collapsed        sampled stacks, one root per stage, in the
+                            collapsed format of flamegraph.pl / speedscope
+  <prefix>.memory.txt       wall time, peak traced memory and the top
+                            allocation sites per stage
+
+With profiling off, stage() is a no-op, so callers wrap stages unconditionally.
+tracemalloc makes a run several times slower. Read the numbers as relative
+costs between stages, not as production timings.
+"""
+import os
+import sys
+import atexit
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+
+
+def profile_prefix(output_path):
+    """'OdooCsvFiles/balance_sheet.xlsx' -> 'OdooCsvFiles/balance_sheet.profile-20260221-231500'."""
+    stem = os.path.splitext(output_path.rstrip('/\\'))[0]
+    return f"{stem}.profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+
+def add_profile_arg(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help='write cProfile, tracemalloc and collapsed-stack files per stage next to the output')
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """Samples every other thread's stack into collapsed 'root;outer;...;inner' counts."""
+
+    def __init__(self, root, counts, interval):
+        super().__init__(name='etl-profile-sampler', daemon=True)
+        self.root = root
+        self.counts = counts
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(self.root)
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+class StageProfiler:
+    """Collects per-stage profiles; disabled (a no-op) when prefix is None."""
+
+    def __init__(self, prefix=None, sample_interval=SAMPLE_INTERVAL, top=TOP_ALLOCATIONS):
+        self.prefix = prefix
+        self.sample_interval = sample_interval
+        self.top = top
+        self.stages = []
+        self.collapsed = Counter()
+        self._process_stats = []
+
+    @classmethod
+    def for_output(cls, output_path, enabled):
+        return cls(profile_prefix(output_path) if enabled else None)
+
+    @property
+    def enabled(self):
+        return self.prefix is not None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        thread_profiles = []
+        self._process_stats = []
+        lock = threading.Lock()
+
+        def profile_new_thread(frame, event, arg):
+            # Runs once per thread started inside the stage, then hands over to cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+            with lock:
+                thread_profiles.append(profile)
+
+        # Start the sampler before the hook so it does not profile itself
+        sampler = _StackSampler(name, self.collapsed, self.sample_interval)
+        sampler.start()
+        main_profile = cProfile.Profile()
+        # From Python 3.12 one cProfile sees every thread, and enabling a second
+        # one in a worker raises, so the per-thread hook is only needed before
+        hook_threads = sys.version_info < (3, 12)
+        if hook_threads:
+            threading.setprofile(profile_new_thread)
+        started = time.perf_counter()
+        main_profile.enable()
+        try:
+            yield
+        finally:
+            main_profile.disable()
+            seconds = time.perf_counter() - started
+            if hook_threads:
+                threading.setprofile(None)
+            sampler.stopped.set()
+            sampler.join()
+
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            stats = pstats.Stats(main_profile)
+            with lock:
+                for profile in thread_profiles:
+                    stats.add(profile)
+            for process_stats in self._process_stats:
+                stats.add(process_stats)
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            allocations = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+            self.stages.append({
+                'name': name,
+                'seconds': seconds,
+                'peak': peak,
+                'threads': 1 + len(thread_profiles),
+                'processes': len(self._process_stats),
+                'stats': stats,
+                'allocations': allocations[:self.top],
+            })
+
+    def add_process_stats(self, path):
+        """Merge a cProfile dump written by a worker process into the running stage."""
+        if self.enabled:
+            self._process_stats.append(pstats.Stats(path))
+
+    def write(self):
+        """Write the profile files; returns their paths (empty when disabled)."""
+        if not self.enabled or not self.stages:
+            return []
+        os.makedirs(os.path.dirname(self.prefix) or '.', exist_ok=True)
+        paths = []
+
+        for stage in self.stages:
+            path = f"{self.prefix}.{stage['name']}.pstats"
+            stage['stats'].dump_stats(path)
+            paths.append(path)
+
+        path = f"{self.prefix}.collapsed"
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.collapsed.items()):
+                f.write(f"{stack} {count}\n")
+        paths.append(path)
+
+        path = f"{self.prefix}.memory.txt"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{'stage':<20} {'seconds':>9} {'peak MiB':>9} {'threads':>7} {'processes':>9}\n")
+            for stage in self.stages:
+                f.write(f"{stage['name']:<20} {stage['seconds']:>9.3f} "
+                        f"{stage['peak'] / 2**20:>9.1f} {stage['threads']:>7} {stage['processes']:>9}\n")
+            for stage in self.stages:
+                f.write(f"\n== {stage['name']}: top {self.top} allocation sites (net change) ==\n")
+                for diff in stage['allocations']:
+                    f.write(f"{diff.size_diff / 1024:>10.1f} KiB {diff.count_diff:>+9} blocks  "
+                            f"{diff.traceback}\n")
+        paths.append(path)
+        return paths
+
+    def report_at_exit(self):
+        """Report when the interpreter exits, so runs that sys.exit() on a failure keep their profile."""
+        if self.enabled:
+            atexit.register(self.report)
+
+    def report(self):
+        """Write the files and print a short summary."""
+        paths = self.write()
+        if not paths:
+            return paths
+        print("Profile:")
+        for stage in self.stages:
+            print(f"   {stage['name']:<20} {stage['seconds']:>8.3f}s  peak {stage['peak'] / 2**20:,.1f} MiB")
+        for path in paths:
+            print(f"   {path}")
+        print()
+        return paths
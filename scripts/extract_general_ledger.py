@@ -3,91 +3,67 @@
 Extract General Ledger from Odoo v19
 Raw GL data for P&L, Balance Sheet analysis in Power BI
 Saves to: OdooCsvFiles/general_ledger.csv
+
+With --shard-by-month, writes OdooCsvFiles/general_ledger/YYYY-MM.csv plus a
+manifest instead, rewriting only months whose content changed. Months up to
+--close-through YYYY-MM are fetched and written one last time in that run and
+are closed afterwards: later runs no longer fetch them from Odoo, so their
+shards are not rewritten (scripts/reconcile_general_ledger.py still can).
+
+Credentials come from ODOO_* environment variables, --credentials FILE or
+.env.local (see odoo_client.py), and the password is prompted for otherwise.
+--protocol jsonrpc uses Odoo's /jsonrpc endpoint instead of XML-RPC; the
+output is identical. --profile profiles the fetch, flatten and write stages
+(see etl_profile.py) and leaves the files next to the output.
+--headless never prompts or waits for Enter, for cron; to run several
+extractions on one connection use scripts/odoo_scheduler.py.
 """
-import xmlrpc.client
 import csv
 import os
-import getpass
+import sys
+import argparse
 
-# Your GWR demo credentials
-URL = 'https://guttywaverunner.odoo.com'
-DB = 'guttywaverunner'
-USERNAME = 'guttywaverunnerltd@gmail.com'
+import gl_shards
+from etl_profile import StageProfiler, add_profile_arg
+from odoo_client import OdooClient, PROTOCOLS
 
 # Output folder
 OUTPUT_FOLDER = r'C:\Users\lab\Desktop\GWR-ETL\GWR-WebAPP\gwr-dashboard\OdooCsvFiles'
 OUTPUT_FILE = os.path.join(OUTPUT_FOLDER, 'general_ledger.csv')
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-
-print("=" * 60)
-print("GENERAL LEDGER EXTRACTION")
-print("=" * 60)
-print()
-print(f"Output: {OUTPUT_FILE}")
-print()
-print("This extracts ALL journal entries for:")
-print("  - P&L analysis in Power BI")
-print("  - Balance Sheet")
-print("  - Custom financial reports")
-print()
-
-PASSWORD = getpass.getpass(f"Enter password for {USERNAME}: ")
-print()
-
-try:
-    # Connect
-    print("Step 1/3: Connecting to Odoo...")
-    common = xmlrpc.client.ServerProxy(f'{URL}/xmlrpc/2/common')
-    uid = common.authenticate(DB, USERNAME, PASSWORD, {})
-
-    if not uid:
-        print("Authentication failed!")
-        input("Press Enter to exit...")
-        exit(1)
-
-    print(f"Connected (User ID: {uid})")
-    print()
-
-    # Extract journal entries with pagination (no hard limit)
-    print("Step 2/3: Extracting journal entries...")
-    models = xmlrpc.client.ServerProxy(f'{URL}/xmlrpc/2/object')
-
-    # Get posted entries only
-    domain = [('parent_state', '=', 'posted')]
-
-    fields = [
-        'move_id',
-        'date',
-        'account_id',
-        'partner_id',
-        'name',               # Description
-        'ref',                # Reference
-        'debit',
-        'credit',
-        'balance',
-        'journal_id',
-        'company_id',
-    ]
-
-    # First get total count
-    total_count = models.execute_kw(
-        DB, uid, PASSWORD,
-        'account.move.line', 'search_count',
-        [domain]
-    )
+SHARD_FOLDER = os.path.join(OUTPUT_FOLDER, 'general_ledger')
+
+# Get posted entries only
+DOMAIN = [('parent_state', '=', 'posted')]
+
+FIELDS = [
+    'move_id',
+    'date',
+    'account_id',
+    'partner_id',
+    'name',               # Description
+    'ref',                # Reference
+    'debit',
+    'credit',
+    'balance',
+    'journal_id',
+    'company_id',
+]
+
+BATCH_SIZE = 5000
+
+
+def fetch_entries(client, domain):
+    """Fetch ALL move lines matching `domain` in batches (no limit cap)."""
+    total_count = client.search_count('account.move.line', domain)
     print(f"   Total posted journal entries: {total_count}")
 
-    # Fetch ALL entries in batches (no limit cap)
-    BATCH_SIZE = 5000
     entries = []
     offset = 0
 
     while offset < total_count:
-        batch = models.execute_kw(
-            DB, uid, PASSWORD,
-            'account.move.line', 'search_read',
-            [domain],
-            {'fields': fields, 'limit': BATCH_SIZE, 'offset': offset, 'order': 'date asc'}
+        batch = client.search_read(
+            'account.move.line', domain, FIELDS,
+            limit=BATCH_SIZE, offset=offset, order='date asc'
         )
         entries.extend(batch)
         offset += len(batch)
@@ -97,27 +73,11 @@ try:
         if len(batch) == 0:
             break
 
-    print(f"Found {len(entries)} journal entries")
-    print()
-
-    if not entries:
-        print("No journal entries found!")
-        input("Press Enter to exit...")
-        exit(0)
-
-    # Show sample
-    print("Sample entry:")
-    sample = entries[0]
-    account = sample.get('account_id', ['', 'N/A'])
-    print(f"  Date: {sample.get('date')}")
-    print(f"  Account: {account[1] if isinstance(account, list) else 'N/A'}")
-    print(f"  Debit: {sample.get('debit')}")
-    print(f"  Credit: {sample.get('credit')}")
-    print()
+    return entries
 
-    # Prepare CSV data
-    print("Step 3/3: Preparing data for CSV...")
 
+def flatten_entries(entries):
+    """Flatten many2one [id, name] pairs into the CSV row layout."""
     csv_data = []
     for entry in entries:
         # Handle many2one fields
@@ -152,71 +112,195 @@ try:
             'credit': entry.get('credit', 0),
             'balance': entry.get('balance', 0)
         })
+    return csv_data
 
-    print(f"Prepared {len(csv_data)} rows")
+
+def write_csv(csv_data, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=gl_shards.FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(csv_data)
+
+
+def print_statistics(csv_data):
+    total_debit = sum(row['debit'] for row in csv_data)
+    total_credit = sum(row['credit'] for row in csv_data)
+
+    # Date range
+    dates = [row['date'] for row in csv_data if row['date']]
+    min_date = min(dates) if dates else 'N/A'
+    max_date = max(dates) if dates else 'N/A'
+
+    # Unique accounts
+    unique_accounts = set(row['account_id'] for row in csv_data if row['account_id'])
+
+    print("Statistics:")
+    print(f"   Total entries: {len(csv_data)}")
+    print(f"   Date range: {min_date} to {max_date}")
+    print(f"   Unique accounts: {len(unique_accounts)}")
+    print(f"   Total debits: {total_debit:,.2f}")
+    print(f"   Total credits: {total_credit:,.2f}")
+    print(f"   Difference: {abs(total_debit - total_credit):,.2f}")
     print()
 
-    # Write CSV
-    print("Writing CSV file...")
 
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = [
-            'entry_id', 'move_id', 'move_number', 'date',
-            'account_id', 'account_name',
-            'partner_id', 'partner_name',
-            'description', 'reference', 'journal',
-            'debit', 'credit', 'balance'
-        ]
+def open_months_domain(closed_through):
+    """Posted lines dated after the closed period (all lines if nothing is closed)."""
+    if not closed_through:
+        return list(DOMAIN)
+    _, first_open_day = gl_shards.month_bounds(closed_through)
+    return DOMAIN + [('date', '>=', first_open_day)]
 
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
 
-    # Summary
-    if os.path.exists(OUTPUT_FILE):
-        file_size = os.path.getsize(OUTPUT_FILE)
+def run_extraction(client, shard_by_month=False, shard_dir=SHARD_FOLDER, close_through=None,
+                   profiler=None):
+    """Extract the ledger with an authenticated client. Returns the flattened rows."""
+    profiler = profiler or StageProfiler()
+    print(f"Connected (User ID: {client.uid})")
+    print()
 
-        # Calculate stats
-        total_debit = sum(row['debit'] for row in csv_data)
-        total_credit = sum(row['credit'] for row in csv_data)
+    # Extract journal entries with pagination (no hard limit)
+    print("Step 2/3: Extracting journal entries...")
 
-        # Date range
-        dates = [row['date'] for row in csv_data if row['date']]
-        min_date = min(dates) if dates else 'N/A'
-        max_date = max(dates) if dates else 'N/A'
+    domain = list(DOMAIN)
+    if shard_by_month:
+        # Only months the manifest already closed are skipped; months closed by
+        # this run may have no shard yet, so they are fetched one last time
+        closed_through = gl_shards.load_manifest(shard_dir)['closed_through']
+        domain = open_months_domain(closed_through)
+        if closed_through:
+            print(f"   Skipping closed months up to {closed_through}")
+        if close_through and close_through > (closed_through or ''):
+            print(f"   Closing months up to {close_through} after this run")
 
-        # Unique accounts
-        unique_accounts = set(row['account_id'] for row in csv_data if row['account_id'])
+    with profiler.stage('fetch'):
+        entries = fetch_entries(client, domain)
 
-        print(f"CSV file created successfully!")
+    print(f"Found {len(entries)} journal entries")
+    print()
+
+    if not entries and not shard_by_month:
+        print("No journal entries found!")
+        return []
+
+    if entries:
+        # Show sample
+        print("Sample entry:")
+        sample = entries[0]
+        account = sample.get('account_id', ['', 'N/A'])
+        print(f"  Date: {sample.get('date')}")
+        print(f"  Account: {account[1] if isinstance(account, list) else 'N/A'}")
+        print(f"  Debit: {sample.get('debit')}")
+        print(f"  Credit: {sample.get('credit')}")
         print()
-        print("=" * 60)
-        print("SUCCESS!")
-        print("=" * 60)
+
+    # Prepare CSV data
+    print("Step 3/3: Preparing data for CSV...")
+    with profiler.stage('flatten'):
+        csv_data = flatten_entries(entries)
+    print(f"Prepared {len(csv_data)} rows")
+    print()
+
+    if shard_by_month:
+        print("Writing monthly shards...")
+        with profiler.stage('write'):
+            result = gl_shards.write_shards(csv_data, shard_dir, closed_through=close_through)
+        print(f"Shards written: {len(result['written'])}  unchanged: {len(result['unchanged'])}")
+        for month in result['written']:
+            print(f"   {month}")
         print()
-        print(f"Location: {OUTPUT_FILE}")
-        print(f"File size: {file_size:,} bytes")
+        print_statistics(csv_data)
+        print("Next step: load the changed shards:")
+        print("   python scripts/load_general_ledger_copy.py --shards")
         print()
-        print("Statistics:")
-        print(f"   Total entries: {len(csv_data)}")
-        print(f"   Date range: {min_date} to {max_date}")
-        print(f"   Unique accounts: {len(unique_accounts)}")
-        print(f"   Total debits: {total_debit:,.2f}")
-        print(f"   Total credits: {total_credit:,.2f}")
-        print(f"   Difference: {abs(total_debit - total_credit):,.2f}")
+    else:
+        # Write CSV
+        print("Writing CSV file...")
+        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+        with profiler.stage('write'):
+            write_csv(csv_data, OUTPUT_FILE)
+
+        # Summary
+        if os.path.exists(OUTPUT_FILE):
+            file_size = os.path.getsize(OUTPUT_FILE)
+
+            print(f"CSV file created successfully!")
+            print()
+            print("=" * 60)
+            print("SUCCESS!")
+            print("=" * 60)
+            print()
+            print(f"Location: {OUTPUT_FILE}")
+            print(f"File size: {file_size:,} bytes")
+            print()
+            print_statistics(csv_data)
+            print("Next step: run the import script:")
+            print(f"   node scripts/import-general-ledger.mjs")
+            print()
+
+    return csv_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract the General Ledger from Odoo')
+    parser.add_argument('--shard-by-month', action='store_true',
+                        help=f'write one CSV per month under {SHARD_FOLDER} instead of one file')
+    parser.add_argument('--shard-dir', default=SHARD_FOLDER)
+    parser.add_argument('--close-through', metavar='YYYY-MM',
+                        help='mark months up to and including this one as closed (shard mode)')
+    parser.add_argument('--credentials', metavar='FILE', help='KEY=VALUE file with ODOO_* settings')
+    parser.add_argument('--headless', action='store_true',
+                        help='never prompt; fail with a non-zero exit status instead')
+    parser.add_argument('--protocol', choices=PROTOCOLS,
+                        help='Odoo transport (default: ODOO_PROTOCOL or xmlrpc)')
+    add_profile_arg(parser)
+    args = parser.parse_args()
+
+    output = args.shard_dir if args.shard_by_month else OUTPUT_FILE
+    profiler = StageProfiler.for_output(output, args.profile)
+
+    print("=" * 60)
+    print("GENERAL LEDGER EXTRACTION")
+    print("=" * 60)
+    print()
+    print(f"Output: {output}")
+    print()
+    print("This extracts ALL journal entries for:")
+    print("  - P&L analysis in Power BI")
+    print("  - Balance Sheet")
+    print("  - Custom financial reports")
+    print()
+
+    failed = False
+    try:
+        # Connect
+        client = OdooClient.from_env(args.credentials, interactive=not args.headless,
+                                     protocol=args.protocol)
         print()
-        print("Next step: run the import script:")
-        print(f"   node scripts/import-general-ledger.mjs")
+        print("Step 1/3: Connecting to Odoo...")
+        with client:
+            run_extraction(client, args.shard_by_month, args.shard_dir, args.close_through,
+                           profiler=profiler)
+
+    except Exception as e:
+        failed = True
         print()
+        print("=" * 60)
+        print("ERROR OCCURRED")
+        print("=" * 60)
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+    # Also after a failure: a run that died half way is what needs diagnosing
+    profiler.report()
+
+    if args.headless:
+        sys.exit(1 if failed else 0)
 
-except Exception as e:
     print()
-    print("=" * 60)
-    print("ERROR OCCURRED")
-    print("=" * 60)
-    print(f"Error: {str(e)}")
-    import traceback
-    traceback.print_exc()
+    input("Press Enter to close...")
+
 
-print()
-input("Press Enter to close...")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Month-partitioned General Ledger files.
+
+The extractor can write the ledger as one CSV per accounting month
+(general_ledger/YYYY-MM.csv) plus manifest.json, which records each shard's
+row count and SHA-256. A shard is only rewritten when its content changes.
+Months up to the manifest's closed_through are no longer fetched by the
+extractor, so their shards stay as they were when they were closed. Loaders
+remember the hashes they last loaded in a state file and only reload shards
+whose hash differs.
+"""
+import os
+import io
+import csv
+import json
+import hashlib
+from datetime import datetime, date
+
+MANIFEST_NAME = 'manifest.json'
+STATE_NAME = 'loaded.json'
+
+FIELDNAMES = [
+    'entry_id', 'move_id', 'move_number', 'date',
+    'account_id', 'account_name',
+    'partner_id', 'partner_name',
+    'description', 'reference', 'journal',
+    'debit', 'credit', 'balance'
+]
+
+
+def month_of(date_str):
+    """'2025-03-14' -> '2025-03'."""
+    return str(date_str)[:7]
+
+
+def month_bounds(month):
+    """'2025-03' -> ('2025-03-01', '2025-04-01'), end exclusive."""
+    year, mon = int(month[:4]), int(month[5:7])
+    start = date(year, mon, 1)
+    end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def shard_path(shard_dir, month):
+    return os.path.join(shard_dir, f'{month}.csv')
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_atomic(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_manifest(shard_dir):
+    return _read_json(os.path.join(shard_dir, MANIFEST_NAME), {'closed_through': None, 'shards': {}})
+
+
+def save_manifest(shard_dir, manifest):
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    _write_atomic(os.path.join(shard_dir, MANIFEST_NAME), data)
+
+
+def load_state(path):
+    return _read_json(path, {})
+
+
+def save_state(path, state):
+    _write_atomic(path, json.dumps(state, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def render_shard(rows):
+    """CSV bytes for one month, ordered by entry_id so the hash only tracks content."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDNAMES, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(sorted(rows, key=lambda r: r['entry_id']))
+    return buf.getvalue().encode('utf-8')
+
+
+def write_shards(rows, shard_dir, closed_through=None, months=None):
+    """
+    Split `rows` (flattened ledger dicts) by month and write changed shards.
+
+    `months`, if given, limits which months this run is authoritative for:
+    a month in that set with no rows is written as an empty shard so loaders
+    delete its lines. Without it, every month present in `rows`, plus every
+    manifest month that was still open before this run, is covered.
+    `closed_through` raises the manifest's closed month once the shards are
+    written, so the months it closes are written from this run's rows first.
+
+    Returns {'written': [...], 'unchanged': [...]}.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = load_manifest(shard_dir)
+    closed = manifest['closed_through'] or ''
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(month_of(row['date']), []).append(row)
+
+    if months is None:
+        months = set(by_month) | {m for m in manifest['shards'] if m > closed}
+
+    result = {'written': [], 'unchanged': []}
+    for month in sorted(months):
+        data = render_shard(by_month.get(month, []))
+        digest = hashlib.sha256(data).hexdigest()
+        current = manifest['shards'].get(month)
+
+        if current and current['sha256'] == digest:
+            result['unchanged'].append(month)
+            continue
+
+        _write_atomic(shard_path(shard_dir, month), data)
+        manifest['shards'][month] = {
+            'file': os.path.basename(shard_path(shard_dir, month)),
+            'rows': len(by_month.get(month, [])),
+            'sha256': digest,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        result['written'].append(month)
+
+    if closed_through and closed < closed_through:
+        manifest['closed_through'] = closed_through
+    save_manifest(shard_dir, manifest)
+    return result
+
+
+def changed_shards(shard_dir, state_path=None):
+    """Months whose manifest hash differs from what the loader last loaded, oldest first."""
+    manifest = load_manifest(shard_dir)
+    state = load_state(state_path or os.path.join(shard_dir, STATE_NAME))
+    return [
+        month for month, info in sorted(manifest['shards'].items())
+        if state.get(month) != info['sha256']
+    ]
+
+
+def mark_loaded(shard_dir, month, state_path=None):
+    """Record the manifest hash of `month` as loaded."""
+    path = state_path or os.path.join(shard_dir, STATE_NAME)
+    state = load_state(path)
+    state[month] = load_manifest(shard_dir)['shards'][month]['sha256']
+    save_state(path, state)
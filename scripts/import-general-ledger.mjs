@@ -2,6 +2,11 @@
  * One-time import: OdooCsvFiles/general_ledger.csv → Supabase gwr_general_ledger
  *
  * Usage:  node scripts/import-general-ledger.mjs
+ *         node scripts/import-general-ledger.mjs --shards
+ *
+ * With --shards, reads OdooCsvFiles/general_ledger/ (written by
+ * extract_general_ledger.py --shard-by-month) and only reloads the months whose
+ * manifest hash differs from general_ledger/loaded.json.
  *
  * Requires env vars (reads from ../.env.local automatically):
  *   NEXT_PUBLIC_SUPABASE_URL
@@ -15,6 +20,7 @@ import { fileURLToPath } from 'url';
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
 const CSV_PATH = path.resolve(__dirname, '..', 'OdooCsvFiles', 'general_ledger.csv');
+const SHARD_DIR = path.resolve(__dirname, '..', 'OdooCsvFiles', 'general_ledger');
 
 // Load env vars from .env.local (no dotenv dependency)
 const envPath = path.resolve(__dirname, '..', '.env.local');
@@ -97,15 +103,10 @@ function parseCSV(text) {
   return rows;
 }
 
-async function main() {
-  console.log('Reading CSV...');
-  const raw = fs.readFileSync(CSV_PATH, 'utf-8');
-  const rows = parseCSV(raw);
-
+// ── CSV rows → gwr_general_ledger records ──
+function toRecords(rows) {
   // First row is header
   const header = rows[0];
-  console.log(`Header: ${header.join(', ')}`);
-  console.log(`Total rows (incl. header): ${rows.length}`);
 
   // Map column indices
   const col = {};
@@ -151,6 +152,82 @@ async function main() {
     });
   }
 
+  return { header, records, skipped };
+}
+
+// ── Bulk upsert in batches ──
+const BATCH = 500;
+
+async function upsertRecords(records, label) {
+  let inserted = 0;
+  for (let i = 0; i < records.length; i += BATCH) {
+    const batch = records.slice(i, i + BATCH);
+    const { error } = await sb.from('gwr_general_ledger').upsert(batch, { onConflict: 'entry_id' });
+    if (error) {
+      console.error(`${label} batch ${i}-${i + batch.length} failed:`, error.message);
+      process.exit(1);
+    }
+    inserted += batch.length;
+  }
+  return inserted;
+}
+
+// ── Month shards: reload only what changed since the last run ──
+function monthBounds(month) {
+  const [y, m] = month.split('-').map(Number);
+  const end = m === 12 ? `${y + 1}-01-01` : `${y}-${String(m + 1).padStart(2, '0')}-01`;
+  return [`${month}-01`, end];
+}
+
+async function importShards() {
+  const manifestPath = path.join(SHARD_DIR, 'manifest.json');
+  const statePath = path.join(SHARD_DIR, 'loaded.json');
+  const manifest = JSON.parse(fs.readFileSync(manifestPath, 'utf-8'));
+  const state = fs.existsSync(statePath) ? JSON.parse(fs.readFileSync(statePath, 'utf-8')) : {};
+
+  const months = Object.keys(manifest.shards).sort()
+    .filter((month) => state[month] !== manifest.shards[month].sha256);
+
+  if (months.length === 0) {
+    console.log('All shards already loaded, nothing to do.');
+    return;
+  }
+  console.log(`Changed shards: ${months.length}`);
+
+  for (const month of months) {
+    const shard = manifest.shards[month];
+    const { records } = toRecords(parseCSV(fs.readFileSync(path.join(SHARD_DIR, shard.file), 'utf-8')));
+    const [start, end] = monthBounds(month);
+
+    // Replace the month: drop its lines, then upsert (a line may have moved in from another month)
+    const { error: delErr } = await sb.from('gwr_general_ledger').delete().gte('date', start).lt('date', end);
+    if (delErr) {
+      console.error(`Clearing ${month} failed:`, delErr.message);
+      process.exit(1);
+    }
+    const inserted = await upsertRecords(records, month);
+
+    state[month] = shard.sha256;
+    fs.writeFileSync(statePath, JSON.stringify(state, null, 2));
+    console.log(`  ${month}: ${inserted} rows`);
+  }
+
+  console.log(`\nDone! ${months.length} shards reloaded.`);
+}
+
+async function main() {
+  if (process.argv.includes('--shards')) {
+    await importShards();
+    return;
+  }
+
+  console.log('Reading CSV...');
+  const raw = fs.readFileSync(CSV_PATH, 'utf-8');
+  const rows = parseCSV(raw);
+  const { header, records, skipped } = toRecords(rows);
+
+  console.log(`Header: ${header.join(', ')}`);
+  console.log(`Total rows (incl. header): ${rows.length}`);
   console.log(`Valid records: ${records.length}`);
   console.log(`Skipped rows:  ${skipped}`);
 
@@ -163,7 +240,6 @@ async function main() {
   }
 
   // Bulk insert in batches
-  const BATCH = 500;
   let inserted = 0;
   for (let i = 0; i < records.length; i += BATCH) {
     const batch = records.slice(i, i + BATCH);
@@ -4,10 +4,19 @@ Import Odoo Aged Receivable XLSX snapshot into Supabase.
 
 Usage:  python scripts/import_aged_receivable.py
         python scripts/import_aged_receivable.py path/to/aged_receivable.xlsx
+        python scripts/import_aged_receivable.py --chunk-size 200 --workers 8
+        python scripts/import_aged_receivable.py --profile
+        python scripts/import_aged_receivable.py --reparse
+
+Parsed workbooks are cached in .xlsx-cache/ until the file changes (see xlsx_cache.py).
 """
-import os, sys, json, urllib.request, urllib.error
+import os, sys, json, argparse, urllib.request, urllib.error
 from datetime import datetime
 
+from supabase_bulk import bulk_insert, add_upload_args, print_upload_stats
+from etl_profile import StageProfiler, add_profile_arg
+from xlsx_cache import cached_parse, add_cache_arg
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
 ENV_PATH = os.path.join(PROJECT_DIR, '.env.local')
@@ -35,6 +44,14 @@ def sb_request(method, path, data=None):
         with urllib.request.urlopen(req) as resp: return resp.status, resp.read().decode('utf-8')
     except urllib.error.HTTPError as e: return e.code, e.read().decode('utf-8')
 
+def discard_partial(path, what):
+    """After a failed insert, delete the rows that did go in so readers never see half a snapshot."""
+    print(f"Insert failed, removing the partial {what}...")
+    status, body = sb_request('DELETE', path)
+    if status >= 300: print(f"Delete failed ({status}): {body}\nRe-run the import to replace the partly loaded {what}")
+    else: print(f"Re-run the import to load the {what}")
+    sys.exit(1)
+
 def parse_xlsx(filepath):
     import openpyxl
     wb = openpyxl.load_workbook(filepath, data_only=True)
@@ -46,9 +63,9 @@ def parse_xlsx(filepath):
         date_str = date_cell.replace('As of ', '').strip()
         snapshot_date = datetime.strptime(date_str, '%d/%m/%Y').strftime('%Y-%m-%d')
     else:
-        snapshot_date = datetime.now().strftime('%Y-%m-%d')
+        snapshot_date = None  # main() dates it today; such a parse is not cached
 
-    print(f"Snapshot date: {snapshot_date}")
+    if snapshot_date: print(f"Snapshot date: {snapshot_date}")
 
     # Column layout: A=Partner, B=Invoice Date, C=At Date, D=1-30, E=31-60, F=61-90, G=91-120, H=Older, I=Total
     rows = []
@@ -83,11 +100,24 @@ def parse_xlsx(filepath):
     return snapshot_date, rows
 
 def main():
-    xlsx_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'aged_receivable.xlsx')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('xlsx_path', nargs='?', default=os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'aged_receivable.xlsx'))
+    add_upload_args(parser)
+    add_cache_arg(parser)
+    add_profile_arg(parser)
+    args = parser.parse_args()
+    xlsx_path = args.xlsx_path
     if not os.path.exists(xlsx_path): print(f"Not found: {xlsx_path}"); sys.exit(1)
+    profiler = StageProfiler.for_output(xlsx_path, args.profile)
+    profiler.report_at_exit()
 
     print(f"Reading: {xlsx_path}")
-    snapshot_date, rows = parse_xlsx(xlsx_path)
+    with profiler.stage('parse_xlsx'):
+        snapshot_date, rows = cached_parse(parse_xlsx, xlsx_path, 'aged_receivable', refresh=args.reparse)
+    if snapshot_date is None:
+        snapshot_date = datetime.now().strftime('%Y-%m-%d')
+        print(f"Warning: workbook has no 'As of' date, using today ({snapshot_date})")
+        for row in rows: row['snapshot_date'] = snapshot_date
     print(f"Parsed {len(rows)} rows\n")
 
     for row in rows:
@@ -95,13 +125,17 @@ def main():
         print(f"{prefix}{row['partner_name']:<40} Total: {row['total']:>14,.2f}")
     print()
 
-    print(f"Clearing existing snapshot for {snapshot_date}...")
-    status, body = sb_request('DELETE', f'odoo_ar_snapshots?snapshot_date=eq.{snapshot_date}')
-    if status >= 300: print(f"Delete failed ({status}): {body}"); sys.exit(1)
-
-    print(f"Inserting {len(rows)} rows...")
-    status, body = sb_request('POST', 'odoo_ar_snapshots', rows)
-    if status >= 300: print(f"Insert failed ({status}): {body}"); sys.exit(1)
+    with profiler.stage('upload'):
+        print(f"Clearing existing snapshot for {snapshot_date}...")
+        key_path = f'odoo_ar_snapshots?snapshot_date=eq.{snapshot_date}'
+        status, body = sb_request('DELETE', key_path)
+        if status >= 300: print(f"Delete failed ({status}): {body}"); sys.exit(1)
+
+        print(f"Inserting {len(rows)} rows...")
+        stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, 'odoo_ar_snapshots', rows,
+                            chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']: discard_partial(key_path, f'Aged Receivable snapshot for {snapshot_date}')
 
     total_row = next((r for r in rows if r['is_total']), None)
     if total_row:
@@ -4,16 +4,45 @@ Import Odoo Balance Sheet XLSX snapshot into Supabase.
 
 Usage:  python scripts/import_balance_sheet.py
         python scripts/import_balance_sheet.py path/to/balance_sheet.xlsx
+        python scripts/import_balance_sheet.py --keyframe
+        python scripts/import_balance_sheet.py --profile
+        python scripts/import_balance_sheet.py path/to/bs_history/
+        python scripts/import_balance_sheet.py "exports/balance_sheet_*.xlsx" --parse-workers 8
+        python scripts/import_balance_sheet.py path/to/bs_history/ --chunk-size 200 --workers 8
+
+Only rows that changed since the previous snapshot are stored, with a full
+keyframe every KEYFRAME_INTERVAL snapshots (see supabase-bs-delta-setup.sql).
+A single date is written, together with the keyframe rewrite of the date
+after it, in one odoo_bs_replace_snapshots() call, i.e. one transaction.
+
+A directory or glob backfills every workbook in it (see snapshot_backfill.py).
+Each workbook must carry its own "As of" date, and the dates must be unique.
+The delta chain over the backfilled range is rebuilt in one pass, keeping any
+stored dates inside the range, and the whole range is written with one delete
+and one bulk insert per table.
+
+Parsed workbooks are cached in .xlsx-cache/ until the file changes (see
+xlsx_cache.py); --reparse forces a fresh parse.
 
 Reads Supabase credentials from .env.local (no extra dependencies).
 """
 import os
 import sys
 import json
+import argparse
 import urllib.request
 import urllib.error
+import functools
 from datetime import datetime
 
+from supabase_bulk import bulk_insert, add_upload_args, print_upload_stats
+from etl_profile import StageProfiler, add_profile_arg
+from xlsx_cache import cached_parse, add_cache_arg
+from snapshot_backfill import (
+    is_backfill_input, expand_inputs, parse_workbooks,
+    check_backfill, add_backfill_args,
+)
+
 # ── Load .env.local ──
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
@@ -54,8 +83,12 @@ def supabase_request(method, path, data=None):
         return e.code, e.read().decode('utf-8')
 
 
-def parse_xlsx(filepath):
-    """Parse Odoo Balance Sheet XLSX into structured rows."""
+def parse_xlsx(filepath, strict=False):
+    """Parse Odoo Balance Sheet XLSX into structured rows.
+
+    Without an "As of" date the snapshot date is None and the caller dates it
+    today, or, with strict=True (backfill), the workbook is rejected.
+    """
     import openpyxl
 
     wb = openpyxl.load_workbook(filepath, data_only=True)
@@ -66,10 +99,14 @@ def parse_xlsx(filepath):
     if isinstance(date_cell, str) and 'As of' in date_cell:
         date_str = date_cell.replace('As of ', '').strip()
         snapshot_date = datetime.strptime(date_str, '%d/%m/%Y').strftime('%Y-%m-%d')
+    elif strict:
+        raise ValueError(f"no 'As of' date in cell C1 ({date_cell!r})")
     else:
-        snapshot_date = datetime.now().strftime('%Y-%m-%d')
+        snapshot_date = None
+        print(f"No 'As of' date in cell C1 ({date_cell!r})")
 
-    print(f"Snapshot date: {snapshot_date}")
+    if snapshot_date:
+        print(f"Snapshot date: {snapshot_date}")
 
     # Parse the data rows (starting from row 3 which is the header row)
     rows = []
@@ -135,19 +172,268 @@ def parse_xlsx(filepath):
     return snapshot_date, rows
 
 
+# Write a full keyframe at least every KEYFRAME_INTERVAL snapshots so that
+# rebuilding a date never has to overlay more than that many delta dates.
+KEYFRAME_INTERVAL = 30
+
+# Dates requested per page of the date index (Supabase's default max-rows)
+DATES_PAGE_SIZE = 1000
+
+# Fields compared between consecutive snapshots to detect a changed row
+COMPARED_FIELDS = ('row_order', 'level', 'parent_section', 'code', 'name', 'balance')
+
+
+def assign_row_keys(rows):
+    """Key each row so it can be matched across dates (same key as the SQL migration)."""
+    seen = {}
+    for row in rows:
+        base = f"{row['parent_section'] or ''}|{row['level']}|{row['code'] or ''}|{row['name']}"
+        seen[base] = seen.get(base, 0) + 1
+        row['row_key'] = base if seen[base] == 1 else f"{base}#{seen[base]}"
+    return rows
+
+
+def fetch_snapshot_dates(first, last):
+    """
+    Stored snapshot dates from first to last inclusive, oldest first.
+
+    Read a page at a time after the last date seen, since PostgREST caps each
+    response at its max-rows limit and a backfilled index easily exceeds it.
+    """
+    dates = []
+    lower = f'gte.{first}'
+    while True:
+        status, body = supabase_request(
+            'GET',
+            f'odoo_bs_snapshot_dates?select=snapshot_date&snapshot_date={lower}'
+            f'&snapshot_date=lte.{last}&order=snapshot_date.asc&limit={DATES_PAGE_SIZE}'
+        )
+        if status >= 300:
+            print(f"Reading snapshot dates failed ({status}): {body}")
+            sys.exit(1)
+        page = [d['snapshot_date'] for d in json.loads(body)]
+        if not page:
+            return dates
+        dates.extend(page)
+        lower = f'gt.{page[-1]}'
+
+
+def fetch_neighbours(snapshot_date):
+    """Where snapshot_date falls in the stored chain, via odoo_bs_snapshot_neighbours()."""
+    status, body = supabase_request('GET', f'rpc/odoo_bs_snapshot_neighbours?p_date={snapshot_date}')
+    if status >= 300:
+        print(f"Reading the snapshots around {snapshot_date} failed ({status}): {body}")
+        sys.exit(1)
+    return json.loads(body)[0]
+
+
+def fetch_full_snapshot(snapshot_date):
+    """Rebuild the full stored snapshot for a date via odoo_bs_snapshot_as_of()."""
+    status, body = supabase_request('GET', f'rpc/odoo_bs_snapshot_as_of?p_date={snapshot_date}')
+    if status >= 300:
+        print(f"Reading snapshot {snapshot_date} failed ({status}): {body}")
+        sys.exit(1)
+    return [{
+        'snapshot_date': snapshot_date,
+        'row_order': r['row_order'],
+        'level': r['level'],
+        'parent_section': r['parent_section'],
+        'code': r['code'],
+        'name': r['name'],
+        'balance': round(float(r['balance'] or 0), 2),
+        'row_key': r['row_key'],
+    } for r in json.loads(body)]
+
+
+def diff_snapshot(previous, rows):
+    """Rows that are new or changed since `previous`, plus tombstones for dropped rows."""
+    prev_by_key = {r['row_key']: r for r in previous}
+    changed = [
+        r for r in rows
+        if r['row_key'] not in prev_by_key
+        or any(prev_by_key[r['row_key']][f] != r[f] for f in COMPARED_FIELDS)
+    ]
+    current_keys = {r['row_key'] for r in rows}
+    removed = [dict(r, is_removed=True) for r in previous if r['row_key'] not in current_keys]
+    return changed + removed
+
+
+def build_chain(snapshots):
+    """
+    Store a run of consecutive full snapshots as keyframe + deltas.
+
+    `snapshots` is [(snapshot_date, keyed rows)], oldest first. The first one
+    is a keyframe, then one every KEYFRAME_INTERVAL. Returns
+    [(snapshot_date, stored rows, is_keyframe, total_rows)].
+    """
+    chain = []
+    previous = None
+    for i, (snapshot_date, rows) in enumerate(snapshots):
+        is_keyframe = i % KEYFRAME_INTERVAL == 0
+        stored = rows if is_keyframe else diff_snapshot(previous, rows)
+        chain.append((snapshot_date, stored, is_keyframe, len(rows)))
+        previous = rows
+    return chain
+
+
+def snapshot_payload(snapshot_date, stored, is_keyframe):
+    # Every object must carry the same keys for a PostgREST bulk insert
+    return [{
+        'snapshot_date': snapshot_date,
+        'row_order': r['row_order'],
+        'level': r['level'],
+        'parent_section': r['parent_section'],
+        'code': r['code'],
+        'name': r['name'],
+        'balance': r['balance'],
+        'row_key': r['row_key'],
+        'is_keyframe': is_keyframe,
+        'is_removed': r.get('is_removed', False),
+    } for r in stored]
+
+
+def delete_snapshots(date_filter):
+    """Delete the index entries and stored rows matching a snapshot_date filter, e.g. 'eq.2026-02-21'."""
+    for table in ('odoo_bs_snapshot_dates', 'odoo_bs_snapshots'):
+        status, body = supabase_request('DELETE', f'{table}?snapshot_date={date_filter}')
+        if status >= 300:
+            print(f"Delete from {table} failed ({status}): {body}")
+            sys.exit(1)
+
+
+def insert_rows(table, rows, args):
+    stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, table, rows,
+                        chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']:
+        print("Insert failed, re-run the import to replace the partial snapshot")
+        sys.exit(1)
+
+
+def replace_snapshots(snapshots):
+    """
+    Replace the stored rows and date index entries of several dates in one transaction.
+
+    `snapshots` is [(snapshot_date, stored rows, is_keyframe, total_rows)].
+    """
+    status, body = supabase_request('POST', 'rpc/odoo_bs_replace_snapshots', {'p_snapshots': [{
+        'snapshot_date': snapshot_date,
+        'is_keyframe': is_keyframe,
+        'total_rows': total_rows,
+        'rows': snapshot_payload(snapshot_date, stored, is_keyframe),
+    } for snapshot_date, stored, is_keyframe, total_rows in snapshots]})
+    if status >= 300:
+        print(f"Writing snapshots failed ({status}), nothing was changed: {body}")
+        sys.exit(1)
+
+
+def backfill(args):
+    """Load every workbook in a directory or glob as one rebuilt delta chain."""
+    paths = expand_inputs(args.xlsx_path)
+    if not paths:
+        print(f"No .xlsx files match {args.xlsx_path}")
+        sys.exit(1)
+
+    profiler = StageProfiler.for_output(
+        os.path.join(os.path.dirname(paths[0]), 'balance_sheet_backfill'), args.profile)
+    profiler.report_at_exit()
+
+    print(f"Parsing {len(paths)} workbooks with {min(args.parse_workers, len(paths))} processes...")
+    with profiler.stage('parse_xlsx'):
+        parse = functools.partial(cached_parse, functools.partial(parse_xlsx, strict=True),
+                                  namespace='balance_sheet', refresh=args.reparse)
+        parsed, errors = parse_workbooks(parse, paths, args.parse_workers, profiler)
+    if not check_backfill(parsed, errors, 'snapshot date'):
+        sys.exit(1)
+
+    snapshots = {snapshot_date: assign_row_keys(rows) for _, snapshot_date, rows in parsed}
+    first, last = min(snapshots), max(snapshots)
+    print(f"Parsed {len(snapshots)} snapshots from {first} to {last}")
+    print()
+
+    with profiler.stage('diff'):
+        # Stored dates inside the range that no workbook replaces stay, as part
+        # of the rebuilt chain; the first stored date after the range becomes a
+        # keyframe because its delta base is about to change.
+        kept = [d for d in fetch_snapshot_dates(first, last) if d not in snapshots]
+        if kept:
+            print(f"Keeping {len(kept)} stored snapshots inside the range...")
+        for snapshot_date in kept:
+            snapshots[snapshot_date] = fetch_full_snapshot(snapshot_date)
+
+        chain = build_chain(sorted(snapshots.items()))
+
+        after = fetch_neighbours(last)
+        next_date = None
+        if after['next_date'] and not after['next_is_keyframe']:
+            next_date = after['next_date']
+            print(f"Snapshot {next_date} follows the range, rebuilding it as a keyframe...")
+            next_rows = fetch_full_snapshot(next_date)
+
+    payload = [row for snapshot_date, stored, is_keyframe, _ in chain
+               for row in snapshot_payload(snapshot_date, stored, is_keyframe)]
+    index = [{
+        'snapshot_date': snapshot_date,
+        'is_keyframe': is_keyframe,
+        'stored_rows': len(stored),
+        'total_rows': total_rows,
+    } for snapshot_date, stored, is_keyframe, total_rows in chain]
+    keyframes = sum(1 for _, _, is_keyframe, _ in chain if is_keyframe)
+    total = sum(total_rows for _, _, _, total_rows in chain)
+
+    with profiler.stage('upload'):
+        if next_date:
+            # A keyframe stands on its own, so rewriting it first is safe
+            # whatever happens to the range below
+            print(f"Writing keyframe for {next_date}: {len(next_rows)} rows...")
+            replace_snapshots([(next_date, next_rows, True, len(next_rows))])
+
+        print(f"Clearing stored snapshots from {first} to {last}...")
+        delete_snapshots(f'gte.{first}&snapshot_date=lte.{last}')
+
+        print(f"Inserting {len(payload)} of {total} rows ({len(chain)} dates, {keyframes} keyframes)...")
+        insert_rows('odoo_bs_snapshots', payload, args)
+        # Index rows go in last so half-written dates never show up in the dashboard
+        print(f"Indexing {len(index)} dates...")
+        insert_rows('odoo_bs_snapshot_dates', index, args)
+
+    print(f"Balance sheet backfill from {first} to {last} imported successfully!")
+    print(f"  Dates: {len(chain)}  Rows: {total} ({len(payload)} stored)")
+
+
 def main():
-    # Determine XLSX path
-    if len(sys.argv) > 1:
-        xlsx_path = sys.argv[1]
-    else:
-        xlsx_path = os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'balance_sheet.xlsx')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('xlsx_path', nargs='?',
+                        default=os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'balance_sheet.xlsx'),
+                        help='workbook, or a directory / glob of workbooks to backfill')
+    parser.add_argument('--keyframe', action='store_true',
+                        help='store every row for this date instead of only the changes')
+    add_upload_args(parser)
+    add_cache_arg(parser)
+    add_backfill_args(parser)
+    add_profile_arg(parser)
+    args = parser.parse_args()
+    xlsx_path = args.xlsx_path
+
+    if is_backfill_input(xlsx_path):
+        backfill(args)
+        return
 
     if not os.path.exists(xlsx_path):
         print(f"File not found: {xlsx_path}")
         sys.exit(1)
 
+    profiler = StageProfiler.for_output(xlsx_path, args.profile)
+    profiler.report_at_exit()
+
     print(f"Reading: {xlsx_path}")
-    snapshot_date, rows = parse_xlsx(xlsx_path)
+    with profiler.stage('parse_xlsx'):
+        snapshot_date, rows = cached_parse(parse_xlsx, xlsx_path, 'balance_sheet', refresh=args.reparse)
+    if snapshot_date is None:
+        snapshot_date = datetime.now().strftime('%Y-%m-%d')
+        print(f"Warning: workbook has no 'As of' date, using today ({snapshot_date})")
+        for row in rows:
+            row['snapshot_date'] = snapshot_date
     print(f"Parsed {len(rows)} rows")
     print()
 
@@ -158,26 +444,41 @@ def main():
         print(f"{indent}{code_str}{row['name']}: {row['balance']:,.2f}")
     print()
 
-    # Delete existing snapshot for this date
-    print(f"Clearing existing snapshot for {snapshot_date}...")
-    status, body = supabase_request(
-        'DELETE',
-        f'odoo_bs_snapshots?snapshot_date=eq.{snapshot_date}'
-    )
-    if status >= 300:
-        print(f"Delete failed ({status}): {body}")
-        sys.exit(1)
-    print("Done")
+    with profiler.stage('diff'):
+        assign_row_keys(rows)
+        around = fetch_neighbours(snapshot_date)
+        # Deltas since the last keyframe before this date
+        keyframe_date = around['keyframe_date']
+        deltas_since = around['deltas_since']
 
-    # Insert new rows
-    print(f"Inserting {len(rows)} rows...")
-    status, body = supabase_request('POST', 'odoo_bs_snapshots', rows)
-    if status >= 300:
-        print(f"Insert failed ({status}): {body}")
-        sys.exit(1)
+        if args.keyframe or keyframe_date is None or deltas_since + 1 >= KEYFRAME_INTERVAL:
+            is_keyframe = True
+            stored = rows
+        else:
+            is_keyframe = False
+            previous_date = around['previous_date']
+            print(f"Comparing against snapshot {previous_date}...")
+            stored = diff_snapshot(fetch_full_snapshot(previous_date), rows)
+        writes = [(snapshot_date, stored, is_keyframe, len(rows))]
+
+        # The next stored date was diffed against whatever preceded it before this
+        # import. Rebuild it now and rewrite it as a keyframe in the same
+        # transaction so it does not silently inherit rows from this snapshot.
+        next_date = around['next_date']
+        if next_date and not around['next_is_keyframe']:
+            print(f"Snapshot {next_date} follows this date, rebuilding it as a keyframe...")
+            next_rows = fetch_full_snapshot(next_date)
+            writes.append((next_date, next_rows, True, len(next_rows)))
+
+    kind = 'keyframe' if is_keyframe else 'delta'
+    with profiler.stage('upload'):
+        print(f"Writing {kind} for {snapshot_date}: {len(stored)} of {len(rows)} rows...")
+        if len(writes) > 1:
+            print(f"Writing keyframe for {next_date}: {len(next_rows)} rows...")
+        replace_snapshots(writes)
 
     print(f"Snapshot for {snapshot_date} imported successfully!")
-    print(f"  Rows: {len(rows)}")
+    print(f"  Rows: {len(rows)} ({len(stored)} stored as {kind})")
 
     # Summary
     assets = sum(r['balance'] for r in rows if r['parent_section'] == 'ASSETS' and r['level'] == 'section')
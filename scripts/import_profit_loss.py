@@ -4,8 +4,26 @@ Import Odoo Profit & Loss XLSX snapshot into Supabase.
 
 Usage:  python scripts/import_profit_loss.py
         python scripts/import_profit_loss.py path/to/profit_and_loss.xlsx
+        python scripts/import_profit_loss.py --chunk-size 200 --workers 8
+        python scripts/import_profit_loss.py --profile
+        python scripts/import_profit_loss.py report.xlsx --year 2023
+        python scripts/import_profit_loss.py path/to/pl_history/
+        python scripts/import_profit_loss.py "exports/pl_*.xlsx" --parse-workers 8
+
+A directory or glob backfills every workbook in it (see snapshot_backfill.py).
+The year comes from cell C1; a workbook without a readable year is rejected
+instead of being loaded as some default year.
+
+Parsed workbooks are cached in .xlsx-cache/ until the file changes (see
+xlsx_cache.py); --reparse forces a fresh parse.
 """
-import os, sys, json, urllib.request, urllib.error
+import os, sys, json, argparse, functools, urllib.request, urllib.error
+
+from supabase_bulk import bulk_insert, add_upload_args, print_upload_stats
+from etl_profile import StageProfiler, add_profile_arg
+from xlsx_cache import cached_parse, add_cache_arg
+from snapshot_backfill import (is_backfill_input, expand_inputs, parse_workbooks,
+                               check_backfill, add_backfill_args, parse_year)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
@@ -40,14 +58,24 @@ TOTALS = {'Net Profit'}
 HEADERS = {'Revenue', 'Less Costs of Revenue', 'Less Operating Expenses',
            'Plus Other Income', 'Less Other Expenses'}
 
-def parse_xlsx(filepath):
+def discard_partial(path, what):
+    """After a failed insert, delete the rows that did go in so readers never see half a snapshot."""
+    print(f"Insert failed, removing the partial {what}...")
+    status, body = sb_request('DELETE', path)
+    if status >= 300: print(f"Delete failed ({status}): {body}\nRe-run the import to replace the partly loaded {what}")
+    else: print(f"Re-run the import to load the {what}")
+    sys.exit(1)
+
+def parse_xlsx(filepath, year=None):
     import openpyxl
     wb = openpyxl.load_workbook(filepath, data_only=True)
     ws = wb['Profit and Loss']
 
-    # Year from cell C1
+    # Year from cell C1, unless given explicitly
     year_cell = ws.cell(1, 3).value
-    snapshot_year = int(year_cell) if isinstance(year_cell, (int, float)) else int(str(year_cell).strip()) if str(year_cell).strip().isdigit() else 2025
+    snapshot_year = year or parse_year(year_cell)
+    if snapshot_year is None:
+        raise ValueError(f"cannot read the report year from cell C1 ({year_cell!r})")
 
     print(f"Report year: {snapshot_year}")
     rows = []
@@ -92,12 +120,59 @@ def parse_xlsx(filepath):
 
     return snapshot_year, rows
 
+def backfill(args):
+    paths = expand_inputs(args.xlsx_path)
+    if not paths: print(f"No .xlsx files match {args.xlsx_path}"); sys.exit(1)
+    profiler = StageProfiler.for_output(os.path.join(os.path.dirname(paths[0]), 'profit_and_loss_backfill'), args.profile)
+    profiler.report_at_exit()
+
+    print(f"Parsing {len(paths)} workbooks with {min(args.parse_workers, len(paths))} processes...")
+    with profiler.stage('parse_xlsx'):
+        parse = functools.partial(cached_parse, parse_xlsx, namespace='profit_loss', refresh=args.reparse)
+        parsed, errors = parse_workbooks(parse, paths, args.parse_workers, profiler)
+    if not check_backfill(parsed, errors, 'year'): sys.exit(1)
+
+    for path, year, year_rows in parsed:
+        net = next((r['balance'] for r in year_rows if r['name'] == 'Net Profit'), 0)
+        print(f"   {year}  {len(year_rows):>4} rows  Net Profit: {net:>15,.2f}  {os.path.basename(path)}")
+    print()
+
+    years = [year for _, year, _ in parsed]
+    rows = [row for _, _, year_rows in parsed for row in year_rows]
+    with profiler.stage('upload'):
+        print(f"Clearing existing P&L for {len(years)} years ({years[0]}-{years[-1]})...")
+        key_path = f"odoo_pl_snapshots?snapshot_year=in.({','.join(map(str, years))})"
+        status, body = sb_request('DELETE', key_path)
+        if status >= 300: print(f"Delete failed ({status}): {body}"); sys.exit(1)
+
+        print(f"Inserting {len(rows)} rows...")
+        stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, 'odoo_pl_snapshots', rows,
+                            chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']: discard_partial(key_path, f'P&L snapshots for {years[0]}-{years[-1]}')
+
+    print(f"P&L backfill imported! {len(years)} years, {len(rows)} rows")
+
 def main():
-    xlsx_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'profit_and_loss.xlsx')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('xlsx_path', nargs='?', default=os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'profit_and_loss.xlsx'),
+                        help='workbook, or a directory / glob of workbooks to backfill')
+    parser.add_argument('--year', type=int, help='report year, when cell C1 does not have it (single workbook only)')
+    add_upload_args(parser)
+    add_cache_arg(parser)
+    add_backfill_args(parser)
+    add_profile_arg(parser)
+    args = parser.parse_args()
+    xlsx_path = args.xlsx_path
+    if is_backfill_input(xlsx_path): backfill(args); return
     if not os.path.exists(xlsx_path): print(f"Not found: {xlsx_path}"); sys.exit(1)
+    profiler = StageProfiler.for_output(xlsx_path, args.profile)
+    profiler.report_at_exit()
 
     print(f"Reading: {xlsx_path}")
-    snapshot_year, rows = parse_xlsx(xlsx_path)
+    with profiler.stage('parse_xlsx'):
+        try: snapshot_year, rows = cached_parse(parse_xlsx, xlsx_path, 'profit_loss', refresh=args.reparse, year=args.year)
+        except ValueError as e: print(f"{xlsx_path}: {e}, pass --year YYYY"); sys.exit(1)
     print(f"Parsed {len(rows)} rows\n")
 
     for row in rows:
@@ -106,13 +181,17 @@ def main():
         print(f"{indent}{code_str}{row['name']}: {row['balance']:,.2f}")
     print()
 
-    print(f"Clearing existing P&L for {snapshot_year}...")
-    status, body = sb_request('DELETE', f'odoo_pl_snapshots?snapshot_year=eq.{snapshot_year}')
-    if status >= 300: print(f"Delete failed ({status}): {body}"); sys.exit(1)
-
-    print(f"Inserting {len(rows)} rows...")
-    status, body = sb_request('POST', 'odoo_pl_snapshots', rows)
-    if status >= 300: print(f"Insert failed ({status}): {body}"); sys.exit(1)
+    with profiler.stage('upload'):
+        print(f"Clearing existing P&L for {snapshot_year}...")
+        key_path = f'odoo_pl_snapshots?snapshot_year=eq.{snapshot_year}'
+        status, body = sb_request('DELETE', key_path)
+        if status >= 300: print(f"Delete failed ({status}): {body}"); sys.exit(1)
+
+        print(f"Inserting {len(rows)} rows...")
+        stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, 'odoo_pl_snapshots', rows,
+                            chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']: discard_partial(key_path, f'P&L snapshot for {snapshot_year}')
 
     net = next((r['balance'] for r in rows if r['name'] == 'Net Profit'), 0)
     print(f"P&L for {snapshot_year} imported! Net Profit: {net:,.2f}")
@@ -4,15 +4,36 @@ Import Odoo VAT3 Tax Report XLSX snapshot into Supabase.
 
 Usage:  python scripts/import_vat_report.py
         python scripts/import_vat_report.py path/to/vat3_tax_report.xlsx
+        python scripts/import_vat_report.py --chunk-size 200 --workers 8
+        python scripts/import_vat_report.py --profile
+        python scripts/import_vat_report.py report.xlsx --year 2023
+        python scripts/import_vat_report.py path/to/vat_history/
+        python scripts/import_vat_report.py "exports/vat3_*.xlsx" --parse-workers 8
+
+A directory or glob backfills every workbook in it (see snapshot_backfill.py).
+The year comes from cell B1; a workbook without a readable year is rejected.
+
+Parsed workbooks are cached in .xlsx-cache/ until the file changes (see
+xlsx_cache.py); --reparse forces a fresh parse.
 
 Reads Supabase credentials from .env.local (no extra dependencies).
 """
 import os
 import sys
 import json
+import argparse
 import urllib.request
 import urllib.error
 import re
+import functools
+
+from supabase_bulk import bulk_insert, add_upload_args, print_upload_stats
+from etl_profile import StageProfiler, add_profile_arg
+from xlsx_cache import cached_parse, add_cache_arg
+from snapshot_backfill import (
+    is_backfill_input, expand_inputs, parse_workbooks,
+    check_backfill, add_backfill_args, parse_year,
+)
 
 # ── Load .env.local ──
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -68,22 +89,30 @@ TOTAL_LINES = {'5.', '9.', '10.', '14.', '15.3.', '16.', '17.', '18.', '19.'}
 SUBHEADER_LINES = {'1.', '6.', '8.', '15.'}
 
 
-def parse_xlsx(filepath):
+def discard_partial(path, what):
+    """After a failed insert, delete the rows that did go in so readers never see half a snapshot."""
+    print(f"Insert failed, removing the partial {what}...")
+    status, body = supabase_request('DELETE', path)
+    if status >= 300:
+        print(f"Delete failed ({status}): {body}")
+        print(f"Re-run the import to replace the partly loaded {what}")
+    else:
+        print(f"Re-run the import to load the {what}")
+    sys.exit(1)
+
+
+def parse_xlsx(filepath, year=None):
     """Parse Odoo VAT3 Tax Report XLSX into structured rows."""
     import openpyxl
 
     wb = openpyxl.load_workbook(filepath, data_only=True)
     ws = wb['VAT3 Tax Report']
 
-    # Row 1 col B has the year
+    # Row 1 col B has the year, unless given explicitly
     year_cell = ws.cell(1, 2).value
-    if isinstance(year_cell, (int, float)):
-        snapshot_year = int(year_cell)
-    elif isinstance(year_cell, str) and year_cell.strip().isdigit():
-        snapshot_year = int(year_cell.strip())
-    else:
-        snapshot_year = 2025
-        print(f"Warning: Could not parse year from '{year_cell}', defaulting to {snapshot_year}")
+    snapshot_year = year or parse_year(year_cell)
+    if snapshot_year is None:
+        raise ValueError(f"cannot read the report year from cell B1 ({year_cell!r})")
 
     print(f"Report year: {snapshot_year}")
 
@@ -171,19 +200,85 @@ def parse_xlsx(filepath):
     return snapshot_year, rows
 
 
+def backfill(args):
+    """Load every workbook in a directory or glob: one delete, one bulk insert."""
+    paths = expand_inputs(args.xlsx_path)
+    if not paths:
+        print(f"No .xlsx files match {args.xlsx_path}")
+        sys.exit(1)
+
+    profiler = StageProfiler.for_output(
+        os.path.join(os.path.dirname(paths[0]), 'vat3_tax_report_backfill'), args.profile)
+    profiler.report_at_exit()
+
+    print(f"Parsing {len(paths)} workbooks with {min(args.parse_workers, len(paths))} processes...")
+    with profiler.stage('parse_xlsx'):
+        parse = functools.partial(cached_parse, parse_xlsx, namespace='vat3', refresh=args.reparse)
+        parsed, errors = parse_workbooks(parse, paths, args.parse_workers, profiler)
+    if not check_backfill(parsed, errors, 'year'):
+        sys.exit(1)
+
+    for path, year, year_rows in parsed:
+        payable = next((r['vat_value'] for r in year_rows if r['line_number'] == '19.'), None)
+        payable = f"VAT Payable: {payable:>14,.2f}" if payable is not None else ''
+        print(f"   {year}  {len(year_rows):>4} rows  {payable}  {os.path.basename(path)}")
+    print()
+
+    years = [year for _, year, _ in parsed]
+    rows = [row for _, _, year_rows in parsed for row in year_rows]
+
+    with profiler.stage('upload'):
+        print(f"Clearing existing snapshots for {len(years)} years ({years[0]}-{years[-1]})...")
+        key_path = f"odoo_vat_snapshots?snapshot_year=in.({','.join(map(str, years))})"
+        status, body = supabase_request('DELETE', key_path)
+        if status >= 300:
+            print(f"Delete failed ({status}): {body}")
+            sys.exit(1)
+
+        print(f"Inserting {len(rows)} rows...")
+        stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, 'odoo_vat_snapshots', rows,
+                            chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']:
+        discard_partial(key_path, f'VAT snapshots for {years[0]}-{years[-1]}')
+
+    print("VAT report backfill imported successfully!")
+    print(f"  Years: {len(years)}  Rows: {len(rows)}")
+
+
 def main():
-    # Determine XLSX path
-    if len(sys.argv) > 1:
-        xlsx_path = sys.argv[1]
-    else:
-        xlsx_path = os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'vat3_tax_report.xlsx')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('xlsx_path', nargs='?',
+                        default=os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'vat3_tax_report.xlsx'),
+                        help='workbook, or a directory / glob of workbooks to backfill')
+    parser.add_argument('--year', type=int,
+                        help='report year, when cell B1 does not have it (single workbook only)')
+    add_upload_args(parser)
+    add_cache_arg(parser)
+    add_backfill_args(parser)
+    add_profile_arg(parser)
+    args = parser.parse_args()
+    xlsx_path = args.xlsx_path
+
+    if is_backfill_input(xlsx_path):
+        backfill(args)
+        return
 
     if not os.path.exists(xlsx_path):
         print(f"File not found: {xlsx_path}")
         sys.exit(1)
 
+    profiler = StageProfiler.for_output(xlsx_path, args.profile)
+    profiler.report_at_exit()
+
     print(f"Reading: {xlsx_path}")
-    snapshot_year, rows = parse_xlsx(xlsx_path)
+    with profiler.stage('parse_xlsx'):
+        try:
+            snapshot_year, rows = cached_parse(parse_xlsx, xlsx_path, 'vat3',
+                                               refresh=args.reparse, year=args.year)
+        except ValueError as e:
+            print(f"{xlsx_path}: {e}, pass --year YYYY")
+            sys.exit(1)
     print(f"Parsed {len(rows)} rows")
     print()
 
@@ -203,23 +298,23 @@ def main():
         print(f"{indent}{ln}{row['name']}  {net}{vat}")
     print()
 
-    # Delete existing snapshot for this year
-    print(f"Clearing existing snapshot for year {snapshot_year}...")
-    status, body = supabase_request(
-        'DELETE',
-        f'odoo_vat_snapshots?snapshot_year=eq.{snapshot_year}'
-    )
-    if status >= 300:
-        print(f"Delete failed ({status}): {body}")
-        sys.exit(1)
-    print("Done")
-
-    # Insert new rows
-    print(f"Inserting {len(rows)} rows...")
-    status, body = supabase_request('POST', 'odoo_vat_snapshots', rows)
-    if status >= 300:
-        print(f"Insert failed ({status}): {body}")
-        sys.exit(1)
+    with profiler.stage('upload'):
+        # Delete existing snapshot for this year
+        print(f"Clearing existing snapshot for year {snapshot_year}...")
+        key_path = f'odoo_vat_snapshots?snapshot_year=eq.{snapshot_year}'
+        status, body = supabase_request('DELETE', key_path)
+        if status >= 300:
+            print(f"Delete failed ({status}): {body}")
+            sys.exit(1)
+        print("Done")
+
+        # Insert new rows
+        print(f"Inserting {len(rows)} rows...")
+        stats = bulk_insert(SUPABASE_URL, SERVICE_KEY, 'odoo_vat_snapshots', rows,
+                            chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
+    print_upload_stats(stats)
+    if stats['failed']:
+        discard_partial(key_path, f'VAT snapshot for {snapshot_year}')
 
     print(f"VAT report for {snapshot_year} imported successfully!")
     print(f"  Rows: {len(rows)}")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Full reload of OdooCsvFiles/general_ledger.csv into gwr_general_ledger over a
+direct PostgreSQL connection, bypassing the REST API.
+
+Usage:  python scripts/load_general_ledger_copy.py
+        python scripts/load_general_ledger_copy.py path/to/general_ledger.csv
+        python scripts/load_general_ledger_copy.py --no-prune
+        python scripts/load_general_ledger_copy.py --dsn postgresql://postgres:pw@localhost:5432/postgres
+        python scripts/load_general_ledger_copy.py --shards
+
+Rows are streamed with COPY FROM STDIN into a temporary (unlogged, session
+local) staging table, then merged into the target with a single
+INSERT ... ON CONFLICT (entry_id). Unchanged rows are left untouched, and
+unless --no-prune is given, ledger lines missing from the CSV are deleted,
+which matches the truncate-and-insert behaviour of import-general-ledger.mjs.
+
+With --shards, reads the month shards written by
+extract_general_ledger.py --shard-by-month and reloads only the months whose
+hash changed since the last load, pruning within each month.
+
+Reads SUPABASE_DB_URL (the Supabase "Connection string", direct or session
+pooler) from .env.local. Needs psycopg 3:  pip install "psycopg[binary]"
+"""
+import os
+import sys
+import io
+import csv
+import re
+import time
+import argparse
+
+import gl_shards
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+ENV_PATH = os.path.join(PROJECT_DIR, '.env.local')
+CSV_PATH = os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'general_ledger.csv')
+SHARD_DIR = os.path.join(PROJECT_DIR, 'OdooCsvFiles', 'general_ledger')
+
+TARGET_TABLE = 'public.gwr_general_ledger'
+
+# Column order used for COPY, staging and the merge
+GL_COLUMNS = (
+    'entry_id', 'move_id', 'move_number', 'date',
+    'account_id', 'account_name',
+    'partner_id', 'partner_name',
+    'description', 'reference', 'journal',
+    'debit', 'credit', 'balance',
+)
+
+# Rows buffered per COPY write
+COPY_BLOCK_ROWS = 10000
+
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def load_env():
+    """Read .env.local into a dict (no dotenv dependency)."""
+    env_vars = {}
+    if not os.path.exists(ENV_PATH):
+        return env_vars
+    with open(ENV_PATH, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            eq = line.index('=')
+            env_vars[line[:eq].strip()] = line[eq+1:].strip()
+    return env_vars
+
+
+def _num(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def read_general_ledger_csv(path, skipped=None):
+    """
+    Yield GL rows as tuples in GL_COLUMNS order.
+
+    Applies the same rules as import-general-ledger.mjs: grouping rows without
+    an account_id and rows without a YYYY-MM-DD date are skipped (counted in
+    skipped[0] when a one-item list is passed), blanks become NULL and a
+    missing journal becomes 'Unknown'.
+    """
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            account_id = (row.get('account_id') or '').strip()
+            date = (row.get('date') or '').strip()
+            if not account_id or not DATE_RE.match(date):
+                if skipped is not None:
+                    skipped[0] += 1
+                continue
+            partner_id = (row.get('partner_id') or '').strip()
+            yield (
+                int(row['entry_id']),
+                int(row['move_id']),
+                (row.get('move_number') or '').strip(),
+                date,
+                int(account_id),
+                (row.get('account_name') or '').strip(),
+                int(partner_id) if partner_id else None,
+                (row.get('partner_name') or '').strip() or None,
+                (row.get('description') or '').strip() or None,
+                (row.get('reference') or '').strip() or None,
+                (row.get('journal') or '').strip() or 'Unknown',
+                _num(row.get('debit')),
+                _num(row.get('credit')),
+                _num(row.get('balance')),
+            )
+
+
+def connect(dsn):
+    """Open a psycopg 3 connection, with a clear message when it is not installed."""
+    try:
+        import psycopg
+    except ImportError:
+        print('psycopg 3 is required for the COPY loader:  pip install "psycopg[binary]"')
+        sys.exit(1)
+    return psycopg.connect(dsn)
+
+
+def copy_load(conn, rows, target=TARGET_TABLE, prune=True, prune_range=None):
+    """
+    Stream `rows` (tuples in GL_COLUMNS order) into `target` in one transaction.
+
+    With `prune_range` = (start, end), pruning only considers lines dated
+    start <= date < end, which is how a single month shard is reloaded.
+
+    Returns a stats dict: staged, upserted, pruned and seconds for each of the
+    copy / merge / prune phases.
+    """
+    from psycopg import sql
+
+    target_id = sql.Identifier(*target.split('.'))
+    cols = sql.SQL(', ').join(sql.Identifier(c) for c in GL_COLUMNS)
+    updates = sql.SQL(', ').join(
+        sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(c))
+        for c in GL_COLUMNS if c != 'entry_id'
+    )
+    changed = sql.SQL('({}) IS DISTINCT FROM ({})').format(
+        sql.SQL(', ').join(sql.SQL('t.{}').format(sql.Identifier(c)) for c in GL_COLUMNS if c != 'entry_id'),
+        sql.SQL(', ').join(sql.SQL('EXCLUDED.{}').format(sql.Identifier(c)) for c in GL_COLUMNS if c != 'entry_id'),
+    )
+    stats = {}
+
+    with conn.transaction(), conn.cursor() as cur:
+        # Temporary tables are never WAL-logged and vanish with the transaction
+        cur.execute(sql.SQL("""
+            CREATE TEMP TABLE gl_staging (
+              entry_id integer, move_id integer, move_number text, date date,
+              account_id integer, account_name text,
+              partner_id integer, partner_name text,
+              description text, reference text, journal text,
+              debit numeric(15,2), credit numeric(15,2), balance numeric(15,2)
+            ) ON COMMIT DROP
+        """))
+
+        # CSV text built with the C csv writer is much cheaper than per-row
+        # adaptation. Unquoted empty fields load as NULL, except in the NOT NULL
+        # text columns where they stay ''.
+        started = time.perf_counter()
+        staged = 0
+        copy_stmt = sql.SQL(
+            'COPY gl_staging ({}) FROM STDIN (FORMAT csv, FORCE_NOT_NULL (move_number, account_name, journal))'
+        ).format(cols)
+        with cur.copy(copy_stmt) as copy:
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator='\n')
+            for row in rows:
+                writer.writerow(row)
+                staged += 1
+                if staged % COPY_BLOCK_ROWS == 0:
+                    copy.write(buf.getvalue())
+                    buf.seek(0)
+                    buf.truncate()
+            copy.write(buf.getvalue())
+        stats['staged'] = staged
+        stats['copy_seconds'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cur.execute(sql.SQL("""
+            INSERT INTO {target} AS t ({cols})
+            SELECT DISTINCT ON (entry_id) {cols} FROM gl_staging ORDER BY entry_id
+            ON CONFLICT (entry_id) DO UPDATE SET {updates}
+            WHERE {changed}
+        """).format(target=target_id, cols=cols, updates=updates, changed=changed))
+        stats['upserted'] = cur.rowcount
+        stats['merge_seconds'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stats['pruned'] = 0
+        if prune:
+            in_range = sql.SQL('AND t.date >= %s AND t.date < %s' if prune_range else '')
+            cur.execute(sql.SQL("""
+                DELETE FROM {target} t
+                WHERE NOT EXISTS (SELECT 1 FROM gl_staging s WHERE s.entry_id = t.entry_id)
+                {in_range}
+            """).format(target=target_id, in_range=in_range), prune_range)
+            stats['pruned'] = cur.rowcount
+        stats['prune_seconds'] = time.perf_counter() - started
+
+    stats['seconds'] = stats['copy_seconds'] + stats['merge_seconds'] + stats['prune_seconds']
+    return stats
+
+
+def load_shards(dsn, shard_dir, state_path=None):
+    """Reload each month shard whose hash changed since the last load, one transaction per month."""
+    months = gl_shards.changed_shards(shard_dir, state_path)
+    if not months:
+        print("All shards already loaded, nothing to do")
+        return
+
+    print(f"Changed shards: {len(months)}")
+    total = 0
+    with connect(dsn) as conn:
+        for month in months:
+            path = gl_shards.shard_path(shard_dir, month)
+            stats = copy_load(conn, read_general_ledger_csv(path),
+                              prune_range=gl_shards.month_bounds(month))
+            gl_shards.mark_loaded(shard_dir, month, state_path)
+            total += stats['staged']
+            print(f"   {month}: {stats['staged']} rows, {stats['upserted']} inserted/updated, "
+                  f"{stats['pruned']} pruned ({stats['seconds']:.2f}s)")
+    print(f"\nDone! {len(months)} shards, {total} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='COPY-based full reload of gwr_general_ledger')
+    parser.add_argument('csv_path', nargs='?', default=CSV_PATH)
+    parser.add_argument('--dsn', help='PostgreSQL connection string (default: SUPABASE_DB_URL from .env.local)')
+    parser.add_argument('--no-prune', action='store_true',
+                        help='keep ledger lines that are not in the CSV')
+    parser.add_argument('--shards', nargs='?', const=SHARD_DIR, metavar='DIR',
+                        help=f'load changed month shards (default dir {SHARD_DIR})')
+    parser.add_argument('--state', metavar='PATH',
+                        help='loaded-hash state file (default DIR/loaded.json)')
+    args = parser.parse_args()
+
+    dsn = args.dsn or os.environ.get('SUPABASE_DB_URL') or load_env().get('SUPABASE_DB_URL', '')
+    if not dsn:
+        print("Missing SUPABASE_DB_URL in .env.local (or pass --dsn)")
+        sys.exit(1)
+    if args.shards:
+        load_shards(dsn, args.shards, args.state)
+        return
+
+    if not os.path.exists(args.csv_path):
+        print(f"File not found: {args.csv_path}")
+        sys.exit(1)
+
+    print(f"Reading: {args.csv_path}")
+    skipped = [0]
+    with connect(dsn) as conn:
+        stats = copy_load(conn, read_general_ledger_csv(args.csv_path, skipped),
+                          prune=not args.no_prune)
+
+    rate = stats['staged'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    print(f"Skipped rows:  {skipped[0]}")
+    print(f"Staged {stats['staged']} rows via COPY in {stats['copy_seconds']:.2f}s")
+    print(f"Merged: {stats['upserted']} inserted/updated in {stats['merge_seconds']:.2f}s")
+    if not args.no_prune:
+        print(f"Pruned: {stats['pruned']} lines no longer in the ledger")
+    print(f"\nDone! {stats['staged']} rows in {stats['seconds']:.2f}s ({rate:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Reusable Odoo external API client for the ETL scripts.
+
+One OdooClient keeps a single persistent HTTP(S) connection for both the
+common and object endpoints, authenticates once and caches the uid (in
+memory, and optionally on disk so cron runs skip the login call), and
+re-authenticates or reconnects transparently when a session goes stale.
+
+It speaks XML-RPC (/xmlrpc/2/*) by default or JSON-RPC (/jsonrpc) with
+protocol='jsonrpc' / ODOO_PROTOCOL=jsonrpc. Results are identical, JSON
+responses are smaller and much cheaper to decode (see
+bench_odoo_transport.py). JSON-RPC errors are raised as xmlrpc.client.Fault
+so callers handle both transports the same way.
+
+Credentials are resolved in this order, first hit wins per value:
+  1. environment: ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD,
+     ODOO_PASSWORD_FILE (file containing only the password), ODOO_PROTOCOL
+  2. a credentials file (KEY=VALUE lines, same keys), e.g. --credentials
+  3. .env.local in the project root (same keys)
+  4. the GWR defaults below; the password is prompted for when interactive
+"""
+import os
+import json
+import socket
+import getpass
+import http.client
+import urllib.parse
+import xmlrpc.client
+
+# Your GWR demo credentials
+DEFAULT_URL = 'https://guttywaverunner.odoo.com'
+DEFAULT_DB = 'guttywaverunner'
+DEFAULT_USERNAME = 'guttywaverunnerltd@gmail.com'
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+ENV_PATH = os.path.join(PROJECT_DIR, '.env.local')
+UID_CACHE_PATH = os.path.join(PROJECT_DIR, '.odoo-session.json')
+
+DEFAULT_TIMEOUT = 300
+
+PROTOCOLS = ('xmlrpc', 'jsonrpc')
+
+# Errors meaning the kept-alive socket was closed by the server or a proxy
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected, http.client.CannotSendRequest,
+    http.client.ResponseNotReady, ConnectionResetError, BrokenPipeError,
+    ConnectionAbortedError,
+)
+
+
+class OdooError(Exception):
+    """Authentication or configuration problem talking to Odoo."""
+
+
+def read_env_file(path):
+    """Read KEY=VALUE lines (the .env.local format) into a dict."""
+    values = {}
+    if not path or not os.path.exists(path):
+        return values
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            eq = line.index('=')
+            values[line[:eq].strip()] = line[eq+1:].strip()
+    return values
+
+
+class _KeepAliveMixin:
+    """
+    Share one HTTP/1.1 connection across every call and endpoint.
+
+    xmlrpc.client already reuses a connection within one Transport, but each
+    ServerProxy normally gets its own. Sharing the transport keeps one TLS
+    session for both /common and /object, and TCP keepalive stops idle NAT
+    or load balancer timeouts from silently dropping it between cron jobs.
+    """
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+        self.connections_opened = 0
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        conn.connect()
+        conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.connections_opened += 1
+        return conn
+
+
+class KeepAliveTransport(_KeepAliveMixin, xmlrpc.client.Transport):
+    pass
+
+
+class KeepAliveSafeTransport(_KeepAliveMixin, xmlrpc.client.SafeTransport):
+    pass
+
+
+class JsonRpcTransport:
+    """Odoo's /jsonrpc endpoint over one persistent HTTP(S) connection."""
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT):
+        parts = urllib.parse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.netloc
+        self.path = parts.path.rstrip('/') + '/jsonrpc'
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._conn = None
+        self._request_id = 0
+
+    def _connection(self):
+        if self._conn is None:
+            conn_cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = conn_cls(self.host, timeout=self.timeout)
+            self._conn.connect()
+            self._conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self.connections_opened += 1
+        return self._conn
+
+    def call(self, service, method, *args):
+        self._request_id += 1
+        body = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': args},
+            'id': self._request_id,
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+
+        # Retry once on a fresh connection if the kept-alive one went stale
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request('POST', self.path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except STALE_CONNECTION_ERRORS:
+                self.close()
+                if attempt:
+                    raise
+
+        if resp.status != 200:
+            raise xmlrpc.client.ProtocolError(f'{self.host}{self.path}', resp.status, resp.reason, dict(resp.getheaders()))
+        reply = json.loads(data)
+        if 'error' in reply:
+            error = reply['error']
+            info = error.get('data') or {}
+            raise xmlrpc.client.Fault(error.get('code', 0),
+                                      f"{info.get('name', '')}: {info.get('message') or error.get('message')}")
+        return reply['result']
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class OdooClient:
+    """Persistent, authenticated connection to one Odoo database."""
+
+    def __init__(self, url, db, username, password, timeout=DEFAULT_TIMEOUT, uid_cache=None,
+                 protocol='xmlrpc'):
+        if protocol not in PROTOCOLS:
+            raise OdooError(f'Unknown Odoo protocol {protocol!r}, expected one of {PROTOCOLS}')
+        self.url = url.rstrip('/')
+        self.db = db
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.uid_cache = uid_cache
+        self.protocol = protocol
+        self._uid = None
+        self._connect()
+
+    @classmethod
+    def from_env(cls, credentials_file=None, interactive=True, uid_cache=UID_CACHE_PATH, **kwargs):
+        """Build a client from the environment / credentials file / .env.local (see module doc)."""
+        sources = [os.environ, read_env_file(credentials_file), read_env_file(ENV_PATH)]
+
+        def lookup(key, default=None):
+            for source in sources:
+                if source.get(key):
+                    return source[key]
+            return default
+
+        url = lookup('ODOO_URL', DEFAULT_URL)
+        db = lookup('ODOO_DB', DEFAULT_DB)
+        username = lookup('ODOO_USERNAME', DEFAULT_USERNAME)
+        password = lookup('ODOO_PASSWORD')
+        password_file = lookup('ODOO_PASSWORD_FILE')
+        if not password and password_file:
+            with open(password_file, 'r') as f:
+                password = f.read().strip()
+        kwargs['protocol'] = kwargs.get('protocol') or lookup('ODOO_PROTOCOL', 'xmlrpc')
+        if not password:
+            if not interactive:
+                raise OdooError('No Odoo password: set ODOO_PASSWORD or ODOO_PASSWORD_FILE, '
+                                'or pass a credentials file')
+            password = getpass.getpass(f"Enter password for {username}: ")
+        return cls(url, db, username, password, uid_cache=uid_cache, **kwargs)
+
+    # ── Connection ──
+
+    def _connect(self):
+        if self.protocol == 'jsonrpc':
+            self.transport = JsonRpcTransport(self.url, timeout=self.timeout)
+            return
+        transport_cls = KeepAliveSafeTransport if self.url.startswith('https') else KeepAliveTransport
+        self.transport = transport_cls(timeout=self.timeout)
+        self.common = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/common',
+                                                transport=self.transport, allow_none=True)
+        self.models = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/object',
+                                                transport=self.transport, allow_none=True)
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def connections_opened(self):
+        return self.transport.connections_opened
+
+    # ── Authentication ──
+
+    def _cache_key(self):
+        return f'{self.url}|{self.db}|{self.username}'
+
+    def _read_cached_uid(self):
+        if not self.uid_cache or not os.path.exists(self.uid_cache):
+            return None
+        try:
+            with open(self.uid_cache, 'r') as f:
+                return json.load(f).get(self._cache_key())
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached_uid(self, uid):
+        if not self.uid_cache:
+            return
+        cache = {}
+        if os.path.exists(self.uid_cache):
+            try:
+                with open(self.uid_cache, 'r') as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+        if uid:
+            cache[self._cache_key()] = uid
+        else:
+            cache.pop(self._cache_key(), None)
+        with open(self.uid_cache, 'w') as f:
+            json.dump(cache, f)
+
+    def authenticate(self, force=False):
+        """Return the uid, logging in only when there is no cached one (or force=True)."""
+        if self._uid and not force:
+            return self._uid
+        uid = None if force else self._read_cached_uid()
+        if not uid:
+            uid = self._rpc('common', 'authenticate', self.db, self.username, self.password, {})
+            if not uid:
+                self._write_cached_uid(None)
+                raise OdooError(f'Authentication failed for {self.username} on {self.db}')
+            self._write_cached_uid(uid)
+        self._uid = uid
+        return uid
+
+    @property
+    def uid(self):
+        return self.authenticate()
+
+    # ── Calls ──
+
+    def _rpc(self, service, method, *args):
+        """Call service.method, reconnecting once if the kept-alive socket went stale."""
+        if self.protocol == 'jsonrpc':
+            return self.transport.call(service, method, *args)
+        proxy = self.common if service == 'common' else self.models
+        try:
+            return getattr(proxy, method)(*args)
+        except STALE_CONNECTION_ERRORS:
+            self.transport.close()
+            return getattr(proxy, method)(*args)
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        """models.execute_kw with the cached uid; re-authenticates once on AccessDenied."""
+        try:
+            return self._rpc('object', 'execute_kw', self.db, self.uid, self.password,
+                             model, method, args, kwargs or {})
+        except xmlrpc.client.Fault as e:
+            if 'AccessDenied' not in e.faultString and 'Access Denied' not in e.faultString:
+                raise
+            uid = self.authenticate(force=True)
+            return self._rpc('object', 'execute_kw', self.db, uid, self.password,
+                             model, method, args, kwargs or {})
+
+    def search_count(self, model, domain):
+        return self.execute_kw(model, 'search_count', [domain])
+
+    def search_read(self, model, domain, fields, **kwargs):
+        return self.execute_kw(model, 'search_read', [domain], dict(kwargs, fields=fields))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Headless runner for the Odoo extraction jobs, for cron or a service.
+
+Usage:  python scripts/odoo_scheduler.py extract-shards reconcile
+        python scripts/odoo_scheduler.py extract
+        python scripts/odoo_scheduler.py extract-shards --every 3600
+        python scripts/odoo_scheduler.py extract-shards reconcile --credentials /etc/gwr/odoo.env
+        python scripts/odoo_scheduler.py extract-shards --protocol jsonrpc
+
+Jobs run back to back on one OdooClient, so the whole run costs one TLS
+handshake and at most one login; the uid is also cached on disk between runs.
+It never prompts. Credentials come from ODOO_* environment variables,
+--credentials or .env.local (see odoo_client.py).
+
+Jobs:
+  extract         full extraction to OdooCsvFiles/general_ledger.csv
+  extract-shards  extraction to month shards (changed months only)
+  reconcile       per-month checksum reconciliation of the shards
+
+Exit status is 1 if any job in the last round failed.
+"""
+import sys
+import time
+import argparse
+import traceback
+from datetime import datetime
+
+from odoo_client import OdooClient, OdooError, PROTOCOLS
+from extract_general_ledger import SHARD_FOLDER, run_extraction
+from reconcile_general_ledger import run_reconciliation
+
+JOBS = {
+    'extract': lambda client, args: run_extraction(client),
+    'extract-shards': lambda client, args: run_extraction(
+        client, shard_by_month=True, shard_dir=args.shard_dir, close_through=args.close_through),
+    'reconcile': lambda client, args: run_reconciliation(client, shard_dir=args.shard_dir),
+}
+
+
+def log(message):
+    print(f"[{datetime.now().isoformat(timespec='seconds')}] {message}", flush=True)
+
+
+def run_round(client, jobs, args):
+    """Run each job once; returns the names of jobs that failed."""
+    failed = []
+    for name in jobs:
+        log(f"Starting {name}")
+        started = time.perf_counter()
+        try:
+            JOBS[name](client, args)
+        except Exception as e:
+            failed.append(name)
+            log(f"{name} failed: {e}")
+            traceback.print_exc()
+        else:
+            log(f"{name} finished in {time.perf_counter() - started:.1f}s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Odoo extraction jobs headless on one connection')
+    parser.add_argument('jobs', nargs='+', choices=sorted(JOBS))
+    parser.add_argument('--every', type=float, metavar='SECONDS',
+                        help='repeat the jobs forever, starting a round every SECONDS')
+    parser.add_argument('--rounds', type=int, help='with --every, stop after this many rounds')
+    parser.add_argument('--credentials', metavar='FILE', help='KEY=VALUE file with ODOO_* settings')
+    parser.add_argument('--shard-dir', default=SHARD_FOLDER)
+    parser.add_argument('--close-through', metavar='YYYY-MM')
+    parser.add_argument('--protocol', choices=PROTOCOLS,
+                        help='Odoo transport (default: ODOO_PROTOCOL or xmlrpc)')
+    args = parser.parse_args()
+
+    try:
+        client = OdooClient.from_env(args.credentials, interactive=False, protocol=args.protocol)
+        log(f"Logged in to {client.url} as {client.username} (uid {client.uid})")
+    except (OdooError, OSError) as e:
+        log(f"Cannot connect to Odoo: {e}")
+        sys.exit(1)
+
+    rounds = 0
+    with client:
+        while True:
+            started = time.monotonic()
+            failed = run_round(client, args.jobs, args)
+            rounds += 1
+            log(f"Round {rounds} done, {len(failed)} failed, "
+                f"{client.connections_opened} connection(s) opened so far")
+
+            if not args.every or (args.rounds and rounds >= args.rounds):
+                break
+            time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
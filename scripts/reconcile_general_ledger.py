@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Reconcile the local General Ledger copy with Odoo, month by month.
+
+Usage:  python scripts/reconcile_general_ledger.py
+        python scripts/reconcile_general_ledger.py --dry-run
+        python scripts/reconcile_general_ledger.py --csv OdooCsvFiles/general_ledger.csv
+
+Moves that are reset to draft, cancelled or deleted in Odoo stay in an
+incremental or sharded extract forever. For every month this compares a
+fingerprint of Odoo's posted lines with the local copy: line count, sum of
+debits and sum of credits (aggregated by Odoo with read_group), plus a
+SHA-256 of the sorted entry_ids. The ids come from an id/date-only read and
+are hashed here, since Odoo has no server-side hash. Only months that disagree
+are re-fetched in full. Their shard (or their slice of the CSV) is rewritten,
+closed months included, which drops tombstoned lines. The shard loaders then
+prune those lines from gwr_general_ledger on their next run.
+
+Exit status: 0 when everything matched or was repaired, 2 when --dry-run
+found differences.
+"""
+import os
+import sys
+import csv
+import hashlib
+import argparse
+import xmlrpc.client
+
+import gl_shards
+from extract_general_ledger import (
+    DOMAIN, SHARD_FOLDER, OUTPUT_FILE,
+    fetch_entries, flatten_entries, write_csv,
+)
+from odoo_client import OdooClient, OdooError, PROTOCOLS
+
+# Rows per id/date page; those records are tiny
+ID_BATCH_SIZE = 50000
+
+
+def fingerprint(count, debit, credit, ids):
+    return {
+        'count': count,
+        'debit': round(debit, 2),
+        'credit': round(credit, 2),
+        'ids_hash': hashlib.sha256(','.join(map(str, sorted(ids))).encode()).hexdigest(),
+    }
+
+
+def _group_month(group):
+    """Month ('YYYY-MM') of a date:month group, across read_group API versions."""
+    value = group.get('date:month')
+    if isinstance(value, (list, tuple)) and value:
+        value = value[0]
+    if isinstance(value, str) and len(value) >= 7 and value[4] == '-':
+        return value[:7]
+    ranges = group.get('__range') or {}
+    bounds = ranges.get('date:month') or ranges.get('date')
+    if bounds:
+        return bounds['from'][:7]
+    for term in group.get('__domain', []) + group.get('__extra_domain', []):
+        if isinstance(term, (list, tuple)) and term[0] == 'date' and term[1] == '>=':
+            return str(term[2])[:7]
+    raise ValueError(f"Cannot tell the month of read_group result {group!r}")
+
+
+def odoo_month_totals(client):
+    """{month: (count, debit, credit)} aggregated by Odoo."""
+    try:
+        # Odoo 19
+        groups = client.execute_kw(
+            'account.move.line', 'formatted_read_group',
+            [DOMAIN, ['date:month'], ['__count', 'debit:sum', 'credit:sum']]
+        )
+    except xmlrpc.client.Fault:
+        groups = client.execute_kw(
+            'account.move.line', 'read_group',
+            [DOMAIN, ['debit:sum', 'credit:sum'], ['date:month']], {'lazy': False}
+        )
+
+    totals = {}
+    for group in groups:
+        count = group.get('__count', group.get('date_count', 0))
+        debit = group.get('debit:sum', group.get('debit')) or 0.0
+        credit = group.get('credit:sum', group.get('credit')) or 0.0
+        totals[_group_month(group)] = (count, debit, credit)
+    return totals
+
+
+def odoo_month_ids(client):
+    """{month: [line ids]} from an id/date-only read."""
+    ids = {}
+    offset = 0
+    while True:
+        batch = client.search_read(
+            'account.move.line', DOMAIN, ['date'],
+            limit=ID_BATCH_SIZE, offset=offset, order='id asc'
+        )
+        for line in batch:
+            ids.setdefault(gl_shards.month_of(line['date']), []).append(line['id'])
+        offset += len(batch)
+        if len(batch) < ID_BATCH_SIZE:
+            break
+    return ids
+
+
+def odoo_fingerprints(client):
+    totals = odoo_month_totals(client)
+    ids = odoo_month_ids(client)
+    return {
+        month: fingerprint(*totals.get(month, (0, 0.0, 0.0)), ids.get(month, []))
+        for month in set(totals) | set(ids)
+    }
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def read_local_rows(shard_dir, csv_path=None):
+    """{month: [csv row dicts]} from the shards or the single CSV."""
+    by_month = {}
+    if csv_path:
+        paths = [csv_path]
+    else:
+        manifest = gl_shards.load_manifest(shard_dir)
+        paths = [os.path.join(shard_dir, info['file']) for info in manifest['shards'].values()]
+    for path in paths:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                if row.get('date'):
+                    by_month.setdefault(gl_shards.month_of(row['date']), []).append(row)
+    return by_month
+
+
+def local_fingerprints(by_month):
+    return {
+        month: fingerprint(
+            len(rows),
+            sum(_float(r['debit']) for r in rows),
+            sum(_float(r['credit']) for r in rows),
+            [int(r['entry_id']) for r in rows],
+        )
+        for month, rows in by_month.items()
+    }
+
+
+def differs(a, b):
+    if a is None or b is None:
+        return True
+    return (a['count'] != b['count']
+            or abs(a['debit'] - b['debit']) >= 0.005
+            or abs(a['credit'] - b['credit']) >= 0.005
+            or a['ids_hash'] != b['ids_hash'])
+
+
+def run_reconciliation(client, shard_dir=SHARD_FOLDER, csv_path=None, dry_run=False):
+    """Compare and repair. Returns the list of months that disagreed."""
+    print("Fingerprinting Odoo (server-side totals + line ids)...")
+    remote = odoo_fingerprints(client)
+    print("Fingerprinting local copy...")
+    local_rows = read_local_rows(shard_dir, csv_path)
+    local = local_fingerprints(local_rows)
+
+    mismatched = sorted(m for m in set(remote) | set(local) if differs(remote.get(m), local.get(m)))
+    print(f"Months checked: {len(set(remote) | set(local))}, mismatched: {len(mismatched)}")
+    print()
+    if not mismatched:
+        print("Local ledger matches Odoo, nothing to do.")
+        return mismatched
+
+    empty = fingerprint(0, 0.0, 0.0, [])
+    for month in mismatched:
+        r, l = remote.get(month, empty), local.get(month, empty)
+        print(f"   {month}: Odoo {r['count']} lines D {r['debit']:,.2f} C {r['credit']:,.2f}"
+              f" | local {l['count']} lines D {l['debit']:,.2f} C {l['credit']:,.2f}")
+    print()
+
+    if dry_run:
+        return mismatched
+
+    print("Re-fetching mismatched months...")
+    fresh = []
+    for month in mismatched:
+        start, end = gl_shards.month_bounds(month)
+        rows = flatten_entries(fetch_entries(
+            client, DOMAIN + [('date', '>=', start), ('date', '<', end)]
+        ))
+        local_ids = {int(r['entry_id']) for r in local_rows.get(month, [])}
+        tombstones = local_ids - {r['entry_id'] for r in rows}
+        print(f"   {month}: {len(rows)} lines, {len(tombstones)} tombstoned")
+        fresh.extend(rows)
+    print()
+
+    if csv_path:
+        kept = [r for m, rows in sorted(local_rows.items()) if m not in mismatched for r in rows]
+        write_csv(sorted(kept + fresh, key=lambda r: (str(r['date']), int(r['entry_id']))), csv_path)
+        print(f"Rewrote {csv_path}")
+        print("Next step: node scripts/import-general-ledger.mjs")
+    else:
+        result = gl_shards.write_shards(fresh, shard_dir, months=set(mismatched))
+        print(f"Rewrote {len(result['written'])} shards")
+        print("Next step: python scripts/load_general_ledger_copy.py --shards")
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile the local General Ledger with Odoo per month')
+    parser.add_argument('--shard-dir', default=SHARD_FOLDER)
+    parser.add_argument('--csv', nargs='?', const=OUTPUT_FILE,
+                        help='reconcile the single general_ledger.csv instead of month shards')
+    parser.add_argument('--dry-run', action='store_true', help='report differences without re-fetching')
+    parser.add_argument('--credentials', metavar='FILE', help='KEY=VALUE file with ODOO_* settings')
+    parser.add_argument('--headless', action='store_true', help='never prompt for a password')
+    parser.add_argument('--protocol', choices=PROTOCOLS,
+                        help='Odoo transport (default: ODOO_PROTOCOL or xmlrpc)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("GENERAL LEDGER RECONCILIATION")
+    print("=" * 60)
+    print()
+    print(f"Local copy: {args.csv or args.shard_dir}")
+    print()
+
+    try:
+        client = OdooClient.from_env(args.credentials, interactive=not args.headless,
+                                     protocol=args.protocol)
+        client.authenticate()
+    except OdooError as e:
+        print(e)
+        sys.exit(1)
+    print()
+
+    with client:
+        mismatched = run_reconciliation(client, args.shard_dir, args.csv, args.dry_run)
+    if args.dry_run and mismatched:
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
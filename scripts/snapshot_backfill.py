@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Historical backfill helpers for the snapshot importers.
+
+Given a directory or a glob instead of one workbook, the P&L, VAT3 and
+Balance Sheet importers parse every workbook in parallel across processes
+(openpyxl is CPU bound, so threads would not help). They check that each
+year or date appears only once, then load everything with one delete and
+one chunked bulk insert instead of a run per file.
+
+With --profile, every workbook is parsed under its own cProfile in the worker
+process, and those stats are merged into the parse_xlsx stage.
+"""
+import io
+import os
+import re
+import glob
+import shutil
+import cProfile
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 4
+
+
+def is_backfill_input(path):
+    """True for a directory or a glob pattern, i.e. more than one workbook."""
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def expand_inputs(path):
+    """Sorted .xlsx paths in a directory or matching a glob, skipping Excel lock files."""
+    pattern = os.path.join(path, '*.xlsx') if os.path.isdir(path) else path
+    return sorted(
+        p for p in glob.glob(pattern)
+        if os.path.isfile(p) and not os.path.basename(p).startswith('~$')
+    )
+
+
+def parse_year(value):
+    """Year from a report's year cell: 2024, 2024.0, '2024' or 'FY 2024'; None if there is no single year."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    years = set(re.findall(r'\b(?:19|20)\d{2}\b', str(value or '')))
+    if len(years) == 1:
+        return int(years.pop())
+    return None
+
+
+def _parse_quietly(parse_fn, path, profile_path=None):
+    # parse_xlsx prints its year/date; from N processes at once that is just noise
+    with contextlib.redirect_stdout(io.StringIO()):
+        if profile_path is None:
+            return parse_fn(path)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(parse_fn, path)
+        finally:
+            profile.dump_stats(profile_path)
+
+
+def parse_workbooks(parse_fn, paths, workers=DEFAULT_PARSE_WORKERS, profiler=None):
+    """
+    Run parse_fn(path) -> (key, rows) over `paths` in a process pool.
+
+    parse_fn must be picklable (a module-level function or a functools.partial
+    of one). Returns (parsed, errors): parsed is [(path, key, rows)] sorted by
+    key, errors is {path: message} for workbooks that failed to parse. With an
+    enabled StageProfiler, each worker's cProfile stats are added to its
+    running stage.
+    """
+    profile_dir = tempfile.mkdtemp(prefix='parse-profile-') if profiler and profiler.enabled else None
+    # Forked workers inherit the parent's active profiler, which from Python
+    # 3.12 stops them from starting their own, so profiled runs spawn them
+    context = multiprocessing.get_context('spawn') if profile_dir else None
+    parsed, errors = [], {}
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(paths))), mp_context=context) as pool:
+            futures = {
+                pool.submit(_parse_quietly, parse_fn, path,
+                            profile_dir and os.path.join(profile_dir, f'{i}.pstats')): (i, path)
+                for i, path in enumerate(paths)
+            }
+            for future in as_completed(futures):
+                i, path = futures[future]
+                try:
+                    key, rows = future.result()
+                except Exception as e:
+                    errors[path] = f"{type(e).__name__}: {e}"
+                else:
+                    parsed.append((path, key, rows))
+                if profile_dir and os.path.exists(os.path.join(profile_dir, f'{i}.pstats')):
+                    profiler.add_process_stats(os.path.join(profile_dir, f'{i}.pstats'))
+    finally:
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+    parsed.sort(key=lambda item: (item[1], item[0]))
+    return parsed, errors
+
+
+def check_backfill(parsed, errors, what):
+    """Print parse errors and duplicate keys; True when the set is safe to load."""
+    for path, message in sorted(errors.items()):
+        print(f"   {os.path.basename(path)}: {message}")
+
+    by_key = {}
+    for path, key, _ in parsed:
+        by_key.setdefault(key, []).append(path)
+    duplicates = {key: paths for key, paths in by_key.items() if len(paths) > 1}
+    for key, paths in sorted(duplicates.items()):
+        print(f"   {what} {key} appears in {len(paths)} workbooks: "
+              f"{', '.join(os.path.basename(p) for p in paths)}")
+
+    if errors or duplicates:
+        print(f"{len(errors)} workbook(s) failed to parse, {len(duplicates)} duplicate {what}(s); nothing was loaded")
+        return False
+    if not parsed:
+        print("No workbooks to load")
+        return False
+    return True
+
+
+def add_backfill_args(parser):
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                        help=f'processes parsing workbooks in backfill mode (default: {DEFAULT_PARSE_WORKERS})')
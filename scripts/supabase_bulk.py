@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Chunked, concurrent inserts into the Supabase REST API (PostgREST).
+
+The importers used to POST a whole parsed snapshot as one JSON body, which
+runs into request-size limits and timeouts on large payloads and cannot be
+retried partially. `bulk_insert` instead streams rows in fixed-size chunks,
+keeps a bounded number of chunk requests in flight, and retries a chunk on
+its own when the server turned it away (429/503) without storing it.
+
+Only the standard library is used, like the importers themselves.
+"""
+import json
+import time
+import argparse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+
+# Statuses that mean the chunk was turned away before it was processed, so a
+# plain POST can be sent again without inserting its rows twice. After a
+# timeout or any other 5xx the rows may already be committed (the snapshot
+# tables only have an identity key), so those fail the chunk instead and the
+# importer asks for a re-run, which replaces the whole snapshot.
+RETRY_STATUSES = {429, 503}
+
+
+def iter_chunks(rows, chunk_size):
+    """Yield lists of at most `chunk_size` rows from any iterable, lazily."""
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def post_rows(supabase_url, service_key, table, rows, timeout=DEFAULT_TIMEOUT):
+    """POST one list of rows to a table. Returns (status, body); status 0 means no response."""
+    url = f"{supabase_url}/rest/v1/{table}"
+    headers = {
+        'apikey': service_key,
+        'Authorization': f'Bearer {service_key}',
+        'Content-Type': 'application/json',
+        'Prefer': 'return=minimal',
+    }
+    body = json.dumps(rows).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        return 0, str(getattr(e, 'reason', e))
+
+
+def _send_chunk(supabase_url, service_key, table, index, chunk, retries, timeout, backoff):
+    """Send one chunk, retrying rejections that stored nothing. Returns (index, rows, status, body, attempts)."""
+    attempt = 0
+    while True:
+        attempt += 1
+        status, body = post_rows(supabase_url, service_key, table, chunk, timeout)
+        if 200 <= status < 300:
+            return index, len(chunk), status, body, attempt
+        if status not in RETRY_STATUSES or attempt > retries:
+            return index, len(chunk), status, body, attempt
+        time.sleep(backoff * (2 ** (attempt - 1)))
+
+
+def bulk_insert(supabase_url, service_key, table, rows,
+                chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, backoff=0.5,
+                progress=None):
+    """
+    Insert `rows` (any iterable of dicts) into `table` in chunks.
+
+    At most `workers` chunk requests run at once and only about twice that many
+    chunks are held in memory, so a generator of rows is consumed as it goes.
+    `progress`, if given, is called as progress(rows_done, chunks_done) after
+    every successful chunk.
+
+    Returns a stats dict: rows, chunks, retries, seconds, rows_per_sec and
+    failed, a list of (chunk_index, rows, status, body) for chunks that still
+    failed after `retries` retries.
+    """
+    stats = {'rows': 0, 'chunks': 0, 'retries': 0, 'failed': []}
+    started = time.perf_counter()
+    max_in_flight = max(1, workers) * 2
+
+    def collect(done):
+        for fut in done:
+            index, count, status, body, attempts = fut.result()
+            stats['retries'] += attempts - 1
+            if 200 <= status < 300:
+                stats['rows'] += count
+                stats['chunks'] += 1
+                if progress:
+                    progress(stats['rows'], stats['chunks'])
+            else:
+                stats['failed'].append((index, count, status, body))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = set()
+        for index, chunk in enumerate(iter_chunks(rows, chunk_size)):
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(_send_chunk, supabase_url, service_key, table,
+                                    index, chunk, retries, timeout, backoff))
+        done, _ = wait(pending)
+        collect(done)
+
+    stats['failed'].sort()
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def add_upload_args(parser):
+    """Register the shared --chunk-size / --workers / --retries options on an argparse parser."""
+    # Checked here, before an importer has deleted the snapshot it replaces
+    parser.add_argument('--chunk-size', type=positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'rows per insert request (default {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--workers', type=positive_int, default=DEFAULT_WORKERS,
+                        help=f'concurrent insert requests (default {DEFAULT_WORKERS})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'retries per failed chunk (default {DEFAULT_RETRIES})')
+
+
+def print_upload_stats(stats):
+    """Print the one-line throughput summary shared by the importers."""
+    print(f"  Sent {stats['rows']} rows in {stats['chunks']} chunks, "
+          f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s, "
+          f"{stats['retries']} retries)")
+    for index, count, status, body in stats['failed']:
+        print(f"  Chunk {index} ({count} rows) failed ({status}): {body}")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed workbooks for the snapshot importers.
+
+openpyxl dominates an importer run, and the same export is often parsed again
+and again while checking it. cached_parse() wraps an importer's parse_xlsx:
+the (key, rows) result is stored under .xlsx-cache/ in the project root as
+gzip-compressed, column-oriented JSON and returned directly next time.
+
+An entry is keyed by the workbook's absolute path and namespace, and is only
+used while the file's size, mtime and SHA-256 all still match. Hashing a
+workbook costs about a millisecond, against a fraction of a second for
+openpyxl. The parser's source file and arguments must match too, so editing an
+importer invalidates its entries. Stale entries are replaced on the next
+parse. Entries whose workbook is gone, or that were not used for
+MAX_AGE_DAYS, are evicted. --reparse ignores the cache and rewrites the entry.
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import inspect
+import functools
+import contextlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(PROJECT_DIR, '.xlsx-cache')
+
+CACHE_VERSION = 1
+MAX_AGE_DAYS = 30
+
+_swept = set()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_sha256(path):
+    return file_sha256(path)
+
+
+def parser_fingerprint(parse_fn, kwargs):
+    """Identify the parser: its source file's hash plus any bound or passed arguments."""
+    bound = {}
+    while isinstance(parse_fn, functools.partial):
+        bound = {**parse_fn.keywords, **bound}
+        parse_fn = parse_fn.func
+    source = inspect.getsourcefile(parse_fn)
+    return {
+        'function': parse_fn.__name__,
+        'source_sha256': _source_sha256(source),
+        'kwargs': repr(sorted((k, v) for k, v in {**bound, **kwargs}.items() if v is not None)),
+    }
+
+
+def entry_path(cache_dir, namespace, filepath):
+    name = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{namespace}-{name}.json.gz')
+
+
+def _pack(rows):
+    """Column-oriented rows when every row has the same keys (they do for all importers)."""
+    columns = list(rows[0]) if rows else []
+    if all(list(row) == columns for row in rows):
+        return {'columns': columns, 'values': [[row[c] for c in columns] for row in rows]}
+    return {'rows': rows}
+
+
+def _unpack(packed):
+    if 'rows' in packed:
+        return packed['rows']
+    columns = packed['columns']
+    return [dict(zip(columns, values)) for values in packed['values']]
+
+
+def _read_entry(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError, EOFError):
+        return None
+    return entry if entry.get('version') == CACHE_VERSION else None
+
+
+def _write_entry(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique temp name: backfill writes entries from several processes at once
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(entry, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def evict_stale(cache_dir=CACHE_DIR, max_age_days=MAX_AGE_DAYS):
+    """Remove entries whose workbook no longer exists or that were not used recently."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    evicted = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        # Backfill processes sweep concurrently, so files may vanish under us
+        with contextlib.suppress(FileNotFoundError):
+            if not name.endswith('.json.gz'):
+                # Leftover temp file from an interrupted write
+                if name.endswith('.tmp') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                continue
+            entry = _read_entry(path)
+            if entry is None or not os.path.exists(entry['path']) or os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                evicted += 1
+    return evicted
+
+
+def cached_parse(parse_fn, filepath, namespace, refresh=False, cache_dir=CACHE_DIR, **kwargs):
+    """
+    parse_fn(filepath, **kwargs), served from the cache when the workbook is unchanged.
+
+    parse_fn must return (key, rows) with JSON-serialisable values, as every
+    importer's parse_xlsx does. A None key (a workbook with no date, which the
+    importer then dates today) is not cached, so a later run dates it again.
+    Module-level, so a functools.partial of it can be handed to the backfill
+    process pool.
+    """
+    if cache_dir not in _swept:
+        _swept.add(cache_dir)
+        evict_stale(cache_dir)
+
+    path = entry_path(cache_dir, namespace, filepath)
+    stat = os.stat(filepath)
+    fingerprint = {
+        'path': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(filepath),
+        'parser': parser_fingerprint(parse_fn, kwargs),
+    }
+
+    entry = None if refresh else _read_entry(path)
+    if entry and all(entry.get(k) == v for k, v in fingerprint.items()):
+        os.utime(path)  # keeps entries in use from ageing out
+        print(f"Using cached parse of {os.path.basename(filepath)} "
+              f"(parsed {entry['parsed_at']}, --reparse to refresh)")
+        return entry['key'], _unpack(entry['rows'])
+
+    key, rows = parse_fn(filepath, **kwargs)
+    if key is None:
+        return key, rows
+    _write_entry(path, {
+        'version': CACHE_VERSION,
+        **fingerprint,
+        'parsed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'key': key,
+        'rows': _pack(rows),
+    })
+    return key, rows
+
+
+def add_cache_arg(parser):
+    parser.add_argument('--reparse', action='store_true',
+                        help='ignore the parsed-workbook cache (.xlsx-cache/) and parse the workbook again')
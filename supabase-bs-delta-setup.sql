@@ -0,0 +1,189 @@
+-- Delta-compressed Balance Sheet snapshots
+-- Run after supabase-bs-snapshot-setup.sql
+--
+-- odoo_bs_snapshots now holds, per snapshot_date, either a full keyframe or
+-- only the rows that changed since the previous snapshot. Rows are matched
+-- across dates by row_key; a row that disappears is stored once with
+-- is_removed = true. odoo_bs_snapshot_dates lists every imported date, and
+-- odoo_bs_snapshot_as_of(date) rebuilds the full snapshot for any date. The
+-- importer places a date with odoo_bs_snapshot_neighbours(date) and writes it
+-- with odoo_bs_replace_snapshots(jsonb).
+
+ALTER TABLE public.odoo_bs_snapshots
+  ADD COLUMN IF NOT EXISTS row_key     text,                            -- parent_section|level|code|name, '#n' for repeats
+  ADD COLUMN IF NOT EXISTS is_keyframe boolean NOT NULL DEFAULT false,  -- true when the date stores every row
+  ADD COLUMN IF NOT EXISTS is_removed  boolean NOT NULL DEFAULT false;  -- tombstone: row no longer in the report
+
+-- Snapshots imported before this migration are full snapshots: key them
+-- the same way scripts/import_balance_sheet.py does and mark them keyframes.
+WITH keyed AS (
+  SELECT id,
+         coalesce(parent_section, '') || '|' || level || '|' || coalesce(code, '') || '|' || name AS base_key,
+         row_number() OVER (
+           PARTITION BY snapshot_date, coalesce(parent_section, ''), level, coalesce(code, ''), name
+           ORDER BY row_order
+         ) AS n
+  FROM public.odoo_bs_snapshots
+  WHERE row_key IS NULL
+)
+UPDATE public.odoo_bs_snapshots s
+   SET row_key = CASE WHEN k.n = 1 THEN k.base_key ELSE k.base_key || '#' || k.n END,
+       is_keyframe = true
+  FROM keyed k
+ WHERE s.id = k.id;
+
+ALTER TABLE public.odoo_bs_snapshots ALTER COLUMN row_key SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bs_snapshots_key_date ON public.odoo_bs_snapshots(row_key, snapshot_date DESC);
+
+-- One row per imported date, including dates where nothing changed
+CREATE TABLE IF NOT EXISTS public.odoo_bs_snapshot_dates (
+  snapshot_date date PRIMARY KEY,
+  is_keyframe   boolean NOT NULL DEFAULT false,
+  stored_rows   integer NOT NULL DEFAULT 0,  -- rows written to odoo_bs_snapshots for this date
+  total_rows    integer NOT NULL DEFAULT 0,  -- rows in the full reconstructed snapshot
+  created_at    timestamptz DEFAULT now()
+);
+
+INSERT INTO public.odoo_bs_snapshot_dates (snapshot_date, is_keyframe, stored_rows, total_rows)
+SELECT snapshot_date, true, count(*), count(*)
+  FROM public.odoo_bs_snapshots
+ GROUP BY snapshot_date
+ON CONFLICT (snapshot_date) DO NOTHING;
+
+ALTER TABLE public.odoo_bs_snapshot_dates ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow read for authenticated users"
+  ON public.odoo_bs_snapshot_dates
+  FOR SELECT
+  TO authenticated
+  USING (true);
+
+CREATE POLICY "Allow all for service role"
+  ON public.odoo_bs_snapshot_dates
+  FOR ALL
+  TO service_role
+  USING (true)
+  WITH CHECK (true);
+
+-- Full snapshot as of p_date: the latest keyframe on or before p_date,
+-- overlaid with the newest stored version of each row up to p_date. Only
+-- dates listed in odoo_bs_snapshot_dates count, so rows left behind by an
+-- interrupted import are ignored.
+CREATE OR REPLACE FUNCTION public.odoo_bs_snapshot_as_of(p_date date)
+RETURNS TABLE (
+  id             bigint,
+  snapshot_date  date,
+  row_key        text,
+  row_order      integer,
+  level          text,
+  parent_section text,
+  code           text,
+  name           text,
+  balance        numeric
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH bounds AS (
+    SELECT max(d.snapshot_date) FILTER (WHERE d.is_keyframe) AS keyframe_date,
+           max(d.snapshot_date)                              AS resolved_date
+      FROM public.odoo_bs_snapshot_dates d
+     WHERE d.snapshot_date <= p_date
+  ),
+  latest AS (
+    SELECT DISTINCT ON (s.row_key) s.*
+      FROM public.odoo_bs_snapshots s
+      JOIN public.odoo_bs_snapshot_dates d ON d.snapshot_date = s.snapshot_date,
+           bounds b
+     WHERE s.snapshot_date BETWEEN b.keyframe_date AND p_date
+     ORDER BY s.row_key, s.snapshot_date DESC
+  )
+  SELECT l.id, b.resolved_date, l.row_key, l.row_order, l.level, l.parent_section, l.code, l.name, l.balance
+    FROM latest l, bounds b
+   WHERE NOT l.is_removed
+   ORDER BY l.row_order;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.odoo_bs_snapshot_as_of(date) TO authenticated, service_role;
+
+-- Where p_date falls in the chain, for the importer: the stored date before
+-- it, the latest keyframe before it, how many delta dates lie between that
+-- keyframe and p_date, and the stored date after it. One row; columns are
+-- NULL when there is no such date. Answered here rather than by reading the
+-- whole index, which PostgREST would cut off at its row limit.
+CREATE OR REPLACE FUNCTION public.odoo_bs_snapshot_neighbours(p_date date)
+RETURNS TABLE (
+  previous_date    date,
+  keyframe_date    date,
+  deltas_since     integer,
+  next_date        date,
+  next_is_keyframe boolean
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH before AS (
+    SELECT max(d.snapshot_date)                              AS previous_date,
+           max(d.snapshot_date) FILTER (WHERE d.is_keyframe) AS keyframe_date
+      FROM public.odoo_bs_snapshot_dates d
+     WHERE d.snapshot_date < p_date
+  ),
+  after AS (
+    SELECT d.snapshot_date, d.is_keyframe
+      FROM public.odoo_bs_snapshot_dates d
+     WHERE d.snapshot_date > p_date
+     ORDER BY d.snapshot_date
+     LIMIT 1
+  )
+  SELECT b.previous_date,
+         b.keyframe_date,
+         (SELECT count(*)::integer
+            FROM public.odoo_bs_snapshot_dates d
+           WHERE d.snapshot_date > b.keyframe_date AND d.snapshot_date < p_date),
+         a.snapshot_date,
+         a.is_keyframe
+    FROM before b
+    LEFT JOIN after a ON true;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.odoo_bs_snapshot_neighbours(date) TO service_role;
+
+-- Replace the stored rows and index entry of every date in p_snapshots in one
+-- transaction, so a date and the keyframe rewrite of the date after it are
+-- either both written or both left as they were. p_snapshots is a JSON array
+-- of {snapshot_date, is_keyframe, total_rows, rows}, where rows are shaped
+-- like odoo_bs_snapshots. Returns the number of rows stored.
+CREATE OR REPLACE FUNCTION public.odoo_bs_replace_snapshots(p_snapshots jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  snap   jsonb;
+  d      date;
+  stored integer := 0;
+  n      integer;
+BEGIN
+  FOR snap IN SELECT * FROM jsonb_array_elements(p_snapshots) LOOP
+    d := (snap->>'snapshot_date')::date;
+    DELETE FROM public.odoo_bs_snapshot_dates WHERE snapshot_date = d;
+    DELETE FROM public.odoo_bs_snapshots WHERE snapshot_date = d;
+
+    INSERT INTO public.odoo_bs_snapshots
+           (snapshot_date, row_order, level, parent_section, code, name, balance,
+            row_key, is_keyframe, is_removed)
+    SELECT d, r.row_order, r.level, r.parent_section, r.code, r.name, r.balance,
+           r.row_key, r.is_keyframe, r.is_removed
+      FROM jsonb_populate_recordset(NULL::public.odoo_bs_snapshots, snap->'rows') r;
+    GET DIAGNOSTICS n = ROW_COUNT;
+
+    INSERT INTO public.odoo_bs_snapshot_dates (snapshot_date, is_keyframe, stored_rows, total_rows)
+    VALUES (d, (snap->>'is_keyframe')::boolean, n, (snap->>'total_rows')::integer);
+    stored := stored + n;
+  END LOOP;
+  RETURN stored;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.odoo_bs_replace_snapshots(jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.odoo_bs_replace_snapshots(jsonb) TO service_role;